@@ -0,0 +1,187 @@
+# benchmarks/load_test.py
+"""
+Concurrent-session load test: drives many simultaneous sessions of main.py through Streamlit's
+AppTest harness against the fake Gemini backend and reports rerun latency, CPU and memory.
+
+    python -m benchmarks.load_test --sessions 1 5 10 20 --actions 15 --output load.json
+
+Every virtual user types prompts (streamed by the fake model), attaches files, switches between
+saved chats and starts new ones. All sessions share one process and one history directory,
+like users of a single `streamlit run` server. No network access is needed.
+"""
+import os
+os.environ.setdefault("GEMINI_FAKE_BACKEND", "1") # Must be set before config is first imported
+os.environ.setdefault("GOOGLE_API_KEY", "fake-load-test-key")
+
+import argparse
+import contextlib
+import datetime
+import json
+import random
+import resource
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+from streamlit.runtime import Runtime
+from streamlit.testing.v1 import AppTest
+# Import from the app's top level and the benchmark suite
+import config
+from core import sessions
+from benchmarks.run_benchmarks import isolated_history_dir, _git_revision
+
+MAIN_SCRIPT = Path(__file__).resolve().parent.parent / "main.py"
+ACTION_WEIGHTS = { "type": 5, "attach": 1, "switch_chat": 2, "new_chat": 1 }
+FAKE_PNG = b"\x89PNG\r\n\x1a\n" + bytes(16 * 1024)
+
+# --- Process Metrics ---
+def current_rss_mb():
+    """Resident set size of this process; falls back to the peak RSS where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as f: return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, AttributeError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+def percentile(samples, pct):
+    if not samples: return None
+    ordered = sorted(samples); index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+@contextlib.contextmanager
+def shared_apptest_runtime():
+    """
+    AppTest installs a process-global mock Runtime before each run and clears it afterwards, which
+    races when sessions run concurrently. Keep the last installed runtime visible until we are done.
+    """
+    last = {"runtime": None}
+    original_instance, original_exists = Runtime.__dict__["instance"], Runtime.__dict__["exists"]
+    def instance(cls):
+        if cls._instance is not None: last["runtime"] = cls._instance
+        if last["runtime"] is None: raise RuntimeError("Runtime hasn't been created!")
+        return last["runtime"]
+    def exists(cls): return cls._instance is not None or last["runtime"] is not None
+    Runtime.instance = classmethod(instance); Runtime.exists = classmethod(exists)
+    try: yield
+    finally: Runtime.instance = original_instance; Runtime.exists = original_exists
+
+# --- Virtual User ---
+class VirtualUser:
+    """One browser session: an AppTest instance plus a record of how long each rerun took."""
+    def __init__(self, user_id, timeout, rng):
+        self.user_id = user_id; self.rng = rng
+        self.app = AppTest.from_file(str(MAIN_SCRIPT), default_timeout=timeout)
+        self.latencies = {action: [] for action in ["initial"] + list(ACTION_WEIGHTS)}
+        self.errors = []
+
+    @property
+    def session_key(self):
+        """The key core.sessions tracks this session under, once its first rerun has registered it."""
+        return self.app.session_state["session_key"] if "session_key" in self.app.session_state else None
+
+    def _timed(self, action, step):
+        start = time.perf_counter()
+        try:
+            step(); self.latencies[action].append((time.perf_counter() - start) * 1000)
+            if self.app.exception: self.errors.append(f"{action}: {self.app.exception[0].message}")
+        except Exception as e: self.errors.append(f"{action}: {type(e).__name__}: {e}")
+
+    def _type(self):
+        self.app.chat_input[0].set_value(f"User {self.user_id} asks question {self.rng.randint(0, 10**6)}").run()
+
+    def _attach(self):
+        try: uploader = self.app.file_uploader(key="file_uploader")
+        except (AttributeError, KeyError): uploader = None
+        if uploader is not None and hasattr(uploader, "upload"): uploader.upload(f"user{self.user_id}.png", FAKE_PNG, "image/png").run()
+        else: # Older Streamlit: AppTest cannot drive file_uploader, so inject the prepared part directly
+            self.app.session_state["pending_file_parts"] = [{ "mime_type": "image/png", "data": FAKE_PNG, "original_filename": f"user{self.user_id}.png" }]
+            self.app.run()
+
+    def _switch_chat(self):
+        load_buttons = [b for b in self.app.button if b.key and b.key.startswith("load_") and b.type != "primary"]
+        if load_buttons: self.rng.choice(load_buttons).click().run()
+        else: self.app.run()
+
+    def _new_chat(self):
+        self.app.button(key="new_chat_top_history").click().run()
+
+    def run(self, actions, think_time, start_barrier):
+        start_barrier.wait()
+        self._timed("initial", self.app.run)
+        steps = { "type": self._type, "attach": self._attach, "switch_chat": self._switch_chat, "new_chat": self._new_chat }
+        for _ in range(actions):
+            if think_time: time.sleep(self.rng.uniform(0, think_time))
+            action = self.rng.choices(list(ACTION_WEIGHTS), weights=list(ACTION_WEIGHTS.values()))[0]
+            self._timed(action, steps[action])
+
+# --- Scenario ---
+def run_level(session_count, actions, think_time, timeout, seed):
+    users = [VirtualUser(i, timeout, random.Random(seed * 1000 + i)) for i in range(session_count)]
+    barrier = threading.Barrier(session_count)
+    threads = [threading.Thread(target=u.run, args=(actions, think_time, barrier), name=f"load-user-{u.user_id}") for u in users]
+    rss_before = current_rss_mb(); cpu_before = time.process_time(); wall_start = time.perf_counter()
+    for t in threads: t.start()
+    for t in threads: t.join()
+    wall = time.perf_counter() - wall_start; cpu = time.process_time() - cpu_before; rss_after = current_rss_mb()
+
+    all_latencies = [ms for u in users for samples in u.latencies.values() for ms in samples]
+    per_action = {}
+    for action in users[0].latencies:
+        samples = [ms for u in users for ms in u.latencies[action]]
+        if samples: per_action[action] = { "count": len(samples), "p50_ms": round(percentile(samples, 50), 2), "p95_ms": round(percentile(samples, 95), 2) }
+    errors = [e for u in users for e in u.errors]
+    session_rows = sessions.get_metrics(keys={u.session_key for u in users}) # Only this level's sessions
+    return { "sessions": session_count, "reruns": len(all_latencies), "wall_s": round(wall, 3),
+        "reruns_per_s": round(len(all_latencies) / wall, 2) if wall else None,
+        "latency_ms": { "p50": round(percentile(all_latencies, 50), 2), "p90": round(percentile(all_latencies, 90), 2),
+            "p99": round(percentile(all_latencies, 99), 2), "mean": round(statistics.fmean(all_latencies), 2) } if all_latencies else None,
+        "per_action": per_action, "cpu_s": round(cpu, 3), "cpu_utilisation": round(cpu / wall, 3) if wall else None,
+        "rss_mb": round(rss_after, 1), "rss_delta_mb": round(rss_after - rss_before, 1),
+        "rss_per_session_mb": round((rss_after - rss_before) / session_count, 2),
+        "session_state_mb": round(sum(row["state_mb"] for row in session_rows), 2), "evicted_sessions": sum(row["evicted"] for row in session_rows),
+        "sessions_tracked": session_rows, "errors": len(errors), "error_samples": errors[:5] }
+
+def print_summary(levels):
+    print(f"\n{'sessions':>8} {'reruns':>7} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'rerun/s':>8} {'cpu %':>6} {'rss MB':>8} {'MB/sess':>8} {'state MB':>9} {'errors':>6}")
+    for lv in levels:
+        lat = lv["latency_ms"] or {}
+        print(f"{lv['sessions']:>8} {lv['reruns']:>7} {lat.get('p50', 0):>9.1f} {lat.get('p90', 0):>9.1f} {lat.get('p99', 0):>9.1f} "
+              f"{lv['reruns_per_s'] or 0:>8.1f} {100 * (lv['cpu_utilisation'] or 0):>6.0f} {lv['rss_mb']:>8.1f} {lv['rss_per_session_mb']:>8.2f} {lv['session_state_mb']:>9.2f} {lv['errors']:>6}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent-session load test for Gemini Chat+ against the fake Gemini backend.")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 5, 10, 20], help="Session counts to step through.")
+    parser.add_argument("--actions", type=int, default=15, help="Interactions per session after the initial page load.")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Max random pause between a user's interactions (s).")
+    parser.add_argument("--first-chunk-latency", type=float, default=0.2, help="Fake model time to first chunk (s).")
+    parser.add_argument("--chunk-latency", type=float, default=0.02, help="Fake model delay between chunks (s).")
+    parser.add_argument("--timeout", type=float, default=120, help="Per-rerun AppTest timeout (s).")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write JSON results to this file.")
+    args = parser.parse_args(argv)
+
+    config.FAKE_BACKEND = True
+    config.FAKE_FIRST_CHUNK_LATENCY = args.first_chunk_latency; config.FAKE_CHUNK_LATENCY = args.chunk_latency
+    levels = []
+    with isolated_history_dir(), shared_apptest_runtime(), open(os.devnull, "w") as devnull:
+        # Untimed warm-up session so one-off module imports are not charged to the first session count
+        with contextlib.redirect_stdout(devnull):
+            warmup = AppTest.from_file(str(MAIN_SCRIPT), default_timeout=args.timeout).run()
+            warmup.chat_input[0].set_value("Warm-up").run()
+        for count in args.sessions:
+            print(f"Running {count} concurrent session(s)...", file=sys.stderr)
+            with contextlib.redirect_stdout(devnull): levels.append(run_level(count, args.actions, args.think_time, args.timeout, args.seed))
+    print_summary(levels)
+
+    if args.output:
+        report = { "meta": { "git_revision": _git_revision(), "recorded_at": datetime.datetime.now().isoformat(),
+            "actions": args.actions, "think_time": args.think_time, "first_chunk_latency": args.first_chunk_latency,
+            "chunk_latency": args.chunk_latency }, "levels": levels }
+        with open(args.output, "w", encoding="utf-8") as f: json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,220 @@
+# benchmarks/run_benchmarks.py
+"""
+Offline benchmarks for the app's own code paths, run against the fake Gemini backend.
+
+    python -m benchmarks.run_benchmarks --output bench.json
+    python -m benchmarks.run_benchmarks --output new.json --compare bench.json
+
+Streamlit calls run in bare mode (no server), where st.session_state still works and
+rendering calls are no-ops, so the timings cover the app's Python work only.
+"""
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import streamlit as st
+# Import from the app's top level and packages
+import config
+import state_manager
+from core import history, logic, fake_gemini, memory, resilience
+
+CHAT_SIZES = [10, 100, 1000]
+HISTORY_DIR_SIZES = [10, 100, 500]
+MESSAGES_PER_SAVED_CHAT = 20
+MEMORY_INDEX_SIZES = [1000, 10000, 100000]
+MEMORY_TURNS_PER_CHAT = 1000
+HEDGING_REQUESTS = 40
+
+# --- Fixtures ---
+def make_messages(count, with_files=True):
+    """Alternating user/model messages; every tenth user turn carries a small inline file part."""
+    messages = []; response_number = 0
+    for i in range(count):
+        if i % 2 == 0:
+            parts = [f"Question {i}: " + "lorem ipsum dolor sit amet " * 8]
+            if with_files and i % 20 == 0: parts.insert(0, { "mime_type": "image/png", "data": b"\x89PNG" + bytes(2048), "original_filename": f"img_{i}.png" })
+            messages.append({ "role": "user", "parts": parts, "display_content": parts[-1] })
+        else:
+            response_number += 1; text = f"Answer {i}: " + "consectetur adipiscing elit " * 40
+            messages.append({ "role": "model", "parts": [text], "display_content": logic.format_display_message("model", text, response_number) })
+    return messages
+
+def reset_session(message_count, model=None):
+    state_manager.initialize_session()
+    state_manager.reset_chat_session_state()
+    st.session_state.messages = make_messages(message_count)
+    st.session_state.response_count = message_count // 2
+    st.session_state.gemini_model = model or fake_gemini.FakeGenerativeModel(config.DEFAULT_MODEL_NAME)
+    st.session_state.genai_configured = True
+
+def populate_history_dir(chat_count):
+    for _ in range(chat_count):
+        reset_session(MESSAGES_PER_SAVED_CHAT); history.save_current_chat_to_file()
+
+@contextlib.contextmanager
+def isolated_history_dir():
+    """Points config at a throwaway history directory so real chats are never touched."""
+    original = (config.HISTORY_DIR, config.LAST_CHAT_ID_FILE)
+    temp_dir = Path(tempfile.mkdtemp(prefix="bench_history_"))
+    config.HISTORY_DIR = temp_dir; config.LAST_CHAT_ID_FILE = temp_dir / ".last_chat_id"
+    try: yield temp_dir
+    finally:
+        config.HISTORY_DIR, config.LAST_CHAT_ID_FILE = original
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+# --- Timing ---
+def measure(func, repeat, setup=None):
+    """Runs setup (untimed) then func `repeat` times; returns summary stats in milliseconds."""
+    samples = []
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for _ in range(repeat):
+            if setup: setup()
+            start = time.perf_counter(); func(); samples.append((time.perf_counter() - start) * 1000)
+    return { "repeat": repeat, "min_ms": round(min(samples), 4), "median_ms": round(statistics.median(samples), 4),
+        "mean_ms": round(statistics.fmean(samples), 4), "max_ms": round(max(samples), 4) }
+
+# --- Benchmarks ---
+def bench_prepare_history(results, repeat):
+    for size in CHAT_SIZES:
+        reset_session(size)
+        results[f"prepare_api_history[messages={size}]"] = measure(lambda: logic.build_api_history(st.session_state.messages), repeat)
+
+def bench_handle_chat_prompt(results, repeat):
+    # One untimed call first, so the one-off google.generativeai import is not charged to the first sample
+    reset_session(CHAT_SIZES[0])
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull): logic.handle_chat_prompt("Warm-up")
+    for size in CHAT_SIZES:
+        results[f"handle_chat_prompt[messages={size}]"] = measure(lambda: logic.handle_chat_prompt("How fast is this?"), repeat, setup=lambda: reset_session(size))
+
+def bench_save_current_chat(results, repeat):
+    for size in CHAT_SIZES:
+        reset_session(size)
+        results[f"save_current_chat_to_file[messages={size}]"] = measure(history.save_current_chat_to_file, repeat)
+
+def bench_history_dir(results, repeat):
+    for dir_size in HISTORY_DIR_SIZES:
+        with isolated_history_dir():
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull): populate_history_dir(dir_size)
+            results[f"list_saved_chats[chats={dir_size}]"] = measure(history.list_saved_chats, repeat)
+            chat_id = st.session_state.current_chat_id
+            results[f"load_chat_from_id[chats={dir_size}]"] = measure(lambda: history.load_chat_from_id(chat_id), repeat)
+
+def bench_display_messages(results, repeat):
+    from ui import chat_display
+    for size in CHAT_SIZES:
+        reset_session(size)
+        results[f"display_chat_messages[messages={size}]"] = measure(chat_display.display_chat_messages, repeat)
+
+def bench_memory(results, repeat):
+    index = memory.get_index()
+    queries = index.embedder.embed([f"question about lorem ipsum topic {i}" for i in range(8)], query=True)
+    for size in MEMORY_INDEX_SIZES:
+        while len(index) < size:
+            chat_id = f"bench_{len(index) // MEMORY_TURNS_PER_CHAT}"
+            turns = [("user" if i % 2 == 0 else "model", " ".join(m["parts"][-1] for m in make_messages(2, with_files=False)) + f" turn {i}") for i in range(MEMORY_TURNS_PER_CHAT)]
+            start = time.perf_counter(); index.add_turns(chat_id, 0, turns)
+            results.setdefault("memory_embed_and_append[turns=1000]", { "repeat": 1, "median_ms": round((time.perf_counter() - start) * 1000, 4) })
+        results[f"memory_search[turns={size},queries=1]"] = measure(lambda: index.search(queries[:1], config.MEMORY_DEFAULT_TOP_K, exclude_tail=("bench_0", 10)), repeat)
+        results[f"memory_search[turns={size},queries=8]"] = measure(lambda: index.search(queries, config.MEMORY_DEFAULT_TOP_K), repeat)
+        reset_session(200)
+        results[f"memory_retrieve_context[turns={size}]"] = measure(lambda: memory.retrieve_context("lorem ipsum question", st.session_state.messages, "bench_0", True,
+            config.MEMORY_DEFAULT_TOP_K, config.MEMORY_DEFAULT_RECENT_TURNS), repeat)
+
+def _percentiles(samples_ms):
+    ordered = sorted(samples_ms)
+    pick = lambda pct: round(ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))], 4)
+    return { "repeat": len(ordered), "median_ms": round(statistics.median(ordered), 4), "p95_ms": pick(95), "p99_ms": pick(99), "max_ms": round(ordered[-1], 4) }
+
+def bench_hedging(results, repeat):
+    """Time to first chunk and success rate through HedgedStream against fake models with latency spikes and outages."""
+    contents = [{ "role": "user", "parts": ["How fast is this?"] }]
+    model_names = [config.DEFAULT_MODEL_NAME] + config.DEFAULT_FAILOVER_MODELS
+    scenarios = { "policy=none": dict(hedge=False, failover=False), "policy=hedge": dict(hedge=True, failover=False),
+        "policy=hedge+failover": dict(hedge=True, failover=True) }
+    def make_models(request):
+        # One RNG per model and request: attempts run in separate threads and hedging adds draws, so a shared
+        # RNG would give each policy different spikes. This way every policy's first attempt sees the same ones.
+        return { name: fake_gemini.FakeGenerativeModel(name, first_chunk_latency=0.02, chunk_latency=0, spike_probability=0.1,
+            spike_latency=0.5, error_rate=0.1 if name == model_names[0] else 0.0, rng=random.Random(f"42-{name}-{request}")) for name in model_names }
+    for label, policy in scenarios.items():
+        first_chunk_ms = []; failures = 0
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            for request in range(HEDGING_REQUESTS):
+                models = make_models(request)
+                stream = resilience.HedgedStream(model_names if policy["failover"] else model_names[:1], models.__getitem__, contents,
+                    None, hedge_deadline=0.1, hedge=policy["hedge"])
+                try:
+                    for _chunk in stream: pass
+                    first_chunk_ms.append(stream.first_chunk_s * 1000)
+                except Exception: failures += 1
+        stats = _percentiles(first_chunk_ms) if first_chunk_ms else { "median_ms": None }
+        stats["failed_requests"] = failures; stats["requests"] = HEDGING_REQUESTS
+        results[f"hedged_first_chunk[{label}]"] = stats
+
+BENCHMARKS = { "prepare_history": bench_prepare_history, "handle_chat_prompt": bench_handle_chat_prompt,
+    "save_current_chat": bench_save_current_chat, "history_dir": bench_history_dir, "display_messages": bench_display_messages,
+    "memory": bench_memory, "hedging": bench_hedging }
+
+def run(selected, repeat):
+    results = {}
+    with isolated_history_dir():
+        for name in selected:
+            print(f"Running {name}...")
+            try: BENCHMARKS[name](results, repeat)
+            except Exception as e: results[f"{name}[error]"] = { "error": f"{type(e).__name__}: {e}" }; print(f"  skipped: {e}")
+    return results
+
+def _git_revision():
+    try: return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception: return None
+
+# --- Comparison ---
+def compare(current, baseline, threshold):
+    """Prints median ratios against a baseline run; returns the names that regressed beyond threshold."""
+    regressions = []
+    print(f"\n{'benchmark':<48} {'baseline':>10} {'current':>10} {'ratio':>7}")
+    for name, stats in current.items():
+        old = baseline.get(name)
+        if "median_ms" not in stats or not old or "median_ms" not in old: continue
+        ratio = stats["median_ms"] / old["median_ms"] if old["median_ms"] else float("inf")
+        flag = "  REGRESSION" if ratio > 1 + threshold else ""
+        if flag: regressions.append(name)
+        print(f"{name:<48} {old['median_ms']:>10.3f} {stats['median_ms']:>10.3f} {ratio:>7.2f}{flag}")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmarks for Gemini Chat+ using a fake Gemini backend.")
+    parser.add_argument("--output", help="Write JSON results to this file.")
+    parser.add_argument("--compare", help="Baseline JSON results to compare against.")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed median slowdown before flagging a regression (default 0.2 = 20%%).")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), help="Run only these benchmarks.")
+    args = parser.parse_args(argv)
+
+    results = run(args.only or list(BENCHMARKS), args.repeat)
+    report = { "meta": { "git_revision": _git_revision(), "recorded_at": datetime.datetime.now().isoformat(),
+        "python": platform.python_version(), "platform": platform.platform(), "repeat": args.repeat }, "results": results }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f: json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+    else: print(json.dumps(report, indent=2))
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f: baseline = json.load(f).get("results", {})
+        regressions = compare(results, baseline, args.threshold)
+        if regressions: print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}."); return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
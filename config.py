@@ -10,6 +10,8 @@ load_dotenv()
 # HISTORY_DIR is relative to where main.py is run
 HISTORY_DIR = Path("chat_history")
 LAST_CHAT_ID_FILE = HISTORY_DIR / ".last_chat_id"
+PROFILE_DIR = Path("profiles")
+STARTUP_PROFILE_FILE = PROFILE_DIR / "startup.jsonl"
 
 # --- Default Settings ---
 DEFAULT_GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
@@ -19,6 +21,31 @@ DEFAULT_TEMPERATURE = 0.7
 DEFAULT_TOP_P = 0.95
 DEFAULT_MAX_TOKENS = 100000 # Increased default for Gemini 1.5 Flash
 
+# Developer mode rerun profiler
+PROFILER_HISTORY_SIZE = 10 # Reruns kept per session
+PROFILER_TOP_N = 15 # Hot spots shown per rerun
+
+# Long-term memory retrieval (core/memory.py)
+MEMORY_EMBEDDER = os.getenv("MEMORY_EMBEDDER", "hashing") # "hashing" (offline) or "gemini"
+MEMORY_HASHING_DIM = 256
+MEMORY_GEMINI_EMBEDDING_MODEL = "models/text-embedding-004"
+MEMORY_DEFAULT_TOP_K = 4
+MEMORY_DEFAULT_RECENT_TURNS = 10 # Messages always sent verbatim when memory is on
+MEMORY_MIN_SCORE = 0.05
+MEMORY_EXCERPT_CHARS = 1000
+
+# Compare mode: one prompt fanned out to several models at once
+COMPARE_TIMEOUT_SECONDS = 300
+
+# Hedged requests and failover (core/resilience.py)
+DEFAULT_HEDGE_DEADLINE_SECONDS = 4.0 # Send a second request if no chunk has arrived by then
+DEFAULT_FAILOVER_MODELS = ["gemini-2.0-flash", "gemini-1.5-flash"]
+
+# Idle-session eviction (core/sessions.py); evicted state is spilled under HISTORY_DIR/.sessions
+SESSION_IDLE_TIMEOUT_SECONDS = float(os.getenv("SESSION_IDLE_TIMEOUT_SECONDS", "1800"))
+SESSION_MEMORY_BUDGET_MB = float(os.getenv("SESSION_MEMORY_BUDGET_MB", "512")) # Across all sessions of this process
+SESSION_SWEEP_INTERVAL_SECONDS = float(os.getenv("SESSION_SWEEP_INTERVAL_SECONDS", "60"))
+
 # Available models list
 AVAILABLE_MODELS = [
     "gemini-2.5-pro-preview-03-25",
@@ -29,6 +56,15 @@ AVAILABLE_MODELS = [
     "gemini-1.5-pro",
 ]
 
+# --- Fake Backend (offline benchmarks and load tests) ---
+FAKE_BACKEND = os.getenv("GEMINI_FAKE_BACKEND", "").lower() in ("1", "true", "yes")
+FAKE_FIRST_CHUNK_LATENCY = float(os.getenv("GEMINI_FAKE_FIRST_CHUNK_LATENCY", "0"))
+FAKE_CHUNK_LATENCY = float(os.getenv("GEMINI_FAKE_CHUNK_LATENCY", "0"))
+FAKE_CHUNK_COUNT = int(os.getenv("GEMINI_FAKE_CHUNK_COUNT", "8"))
+FAKE_SPIKE_PROBABILITY = float(os.getenv("GEMINI_FAKE_SPIKE_PROBABILITY", "0"))
+FAKE_SPIKE_LATENCY = float(os.getenv("GEMINI_FAKE_SPIKE_LATENCY", "5"))
+FAKE_ERROR_RATE = float(os.getenv("GEMINI_FAKE_ERROR_RATE", "0"))
+
 # Ensure history directory exists on import
 try:
     HISTORY_DIR.mkdir(parents=True, exist_ok=True)
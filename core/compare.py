@@ -0,0 +1,97 @@
+# core/compare.py
+# Concurrent fan-out of one request to several models for side-by-side comparison.
+# Worker threads only call the models; every Streamlit update happens on the script thread.
+import queue
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+_DONE = object()
+
+class ModelRun:
+    """Streaming state and timing for one model in a comparison."""
+    def __init__(self, model_name):
+        self.model_name = model_name
+        self.text = ""
+        self.error = None
+        self.started_at = None
+        self.first_chunk_at = None
+        self.finished_at = None
+        self.output_tokens = None
+        self.last_chunk = None
+
+    @property
+    def done(self): return self.finished_at is not None
+
+    def stats(self):
+        """Latency and throughput figures, in seconds and tokens, for display and history notes."""
+        total = (self.finished_at or time.perf_counter()) - self.started_at if self.started_at else None
+        first = self.first_chunk_at - self.started_at if self.first_chunk_at and self.started_at else None
+        tokens = self.output_tokens if self.output_tokens is not None else len(self.text.split())
+        return { "model_name": self.model_name, "first_chunk_s": round(first, 3) if first is not None else None,
+            "total_s": round(total, 3) if total is not None else None, "output_tokens": tokens,
+            "tokens_estimated": self.output_tokens is None,
+            "tokens_per_s": round(tokens / total, 1) if total else None, "error": self.error }
+
+def _chunk_text(chunk):
+    if not getattr(chunk, "parts", None): return ""
+    return "".join(part.text for part in chunk.parts if hasattr(part, "text"))
+
+def _stream_worker(index, model, contents, generation_config, events, cancelled):
+    stream = None
+    try:
+        if cancelled.is_set(): return
+        stream = model.generate_content(contents=contents, generation_config=generation_config, safety_settings={}, stream=True)
+        for chunk in stream:
+            if cancelled.is_set(): return # The SDK cannot abort an open stream; stop reading it instead
+            events.put((index, chunk))
+    except Exception as e:
+        print(f"Error during comparison stream {index}:"); traceback.print_exc()
+        events.put((index, e))
+    finally:
+        close = getattr(stream, "close", None)
+        if cancelled.is_set() and callable(close):
+            try: close()
+            except Exception: pass
+        events.put((index, _DONE))
+
+def fan_out(models, contents, generation_config, on_update=None, timeout=None):
+    """
+    Sends the same contents to every (model_name, model) pair at once and streams the replies.
+    on_update(run_index, run) is called on the calling thread after each chunk, error or completion,
+    so it may safely update Streamlit placeholders. Returns the list of ModelRun results; total wall
+    time tracks the slowest model rather than the sum.
+    """
+    runs = [ModelRun(name) for name, _ in models]
+    events = queue.Queue()
+    cancelled = threading.Event()
+    deadline = time.perf_counter() + timeout if timeout else None
+    executor = ThreadPoolExecutor(max_workers=max(1, len(models)), thread_name_prefix="compare")
+    try:
+        for i, (_, model) in enumerate(models):
+            runs[i].started_at = time.perf_counter()
+            executor.submit(_stream_worker, i, model, contents, generation_config, events, cancelled)
+        remaining = len(models)
+        while remaining:
+            wait = max(0.0, deadline - time.perf_counter()) if deadline else None
+            try: index, item = events.get(timeout=wait)
+            except queue.Empty:
+                for run in runs:
+                    if not run.done: run.error = "Timed out"; run.finished_at = time.perf_counter()
+                break
+            run = runs[index]
+            if item is _DONE:
+                if not run.done: run.finished_at = time.perf_counter()
+                remaining -= 1
+            elif isinstance(item, Exception): run.error = str(item)
+            else:
+                text = _chunk_text(item)
+                if text and run.first_chunk_at is None: run.first_chunk_at = time.perf_counter()
+                run.text += text; run.last_chunk = item
+                usage = getattr(item, "usage_metadata", None)
+                if usage is not None and getattr(usage, "candidates_token_count", None): run.output_tokens = usage.candidates_token_count
+            if on_update: on_update(index, run)
+    finally: # On timeout or an exception in on_update, stop the remaining workers at their next chunk
+        cancelled.set(); executor.shutdown(wait=False, cancel_futures=True)
+    return runs
@@ -0,0 +1,83 @@
+# core/export.py
+import streamlit as st
+import json
+import zipfile
+import datetime
+import io
+# Import from sibling modules
+from . import history
+
+# Exports are built fully in memory: st.download_button needs the whole file as bytes and keeps it in its
+# media file manager anyway. A chat export peaks at about twice its size (the joined text plus its UTF-8
+# bytes); a bulk ZIP holds one parsed chat at a time plus the compressed archive.
+CHAT_FORMATS = { "JSON": ("json", "application/json"), "Markdown": ("md", "text/markdown") }
+BULK_FORMATS = { "ZIP (JSON)": ("zip", "application/zip"), "ZIP (Markdown)": ("zip", "application/zip"),
+    "JSONL": ("jsonl", "application/jsonl") }
+
+# --- Encoders ---
+def iter_chat_json(chat_data):
+    """Yields the chat as indented JSON text pieces."""
+    return json.JSONEncoder(indent=2).iterencode(chat_data)
+
+def iter_chat_markdown(chat_data):
+    """Yields the chat as Markdown text pieces: a header, then one section per message."""
+    yield f"# {chat_data.get('chat_name', 'Untitled Chat')}\n\n"
+    yield f"*Model: `{chat_data.get('model_name', '')}` | Saved: {chat_data.get('saved_at', '')} | Chat ID: `{chat_data.get('chat_id', '')}`*\n\n"
+    system_prompt = chat_data.get("system_prompt")
+    if system_prompt: yield "> **System Instructions:** " + system_prompt.replace("\n", "\n> ") + "\n\n"
+    response_number = 0
+    for msg in chat_data.get("messages", []):
+        if msg.get("role") == "model": response_number += 1; heading = f"## ✨ Model (R{response_number})"
+        else: heading = "## 👤 User"
+        yield f"{heading}\n\n{msg.get('content', '')}\n\n"
+
+CHAT_ENCODERS = { "JSON": iter_chat_json, "Markdown": iter_chat_markdown }
+
+def _collect(pieces):
+    return "".join(pieces).encode("utf-8")
+
+# --- Current Chat ---
+def export_filename(chat_name, extension, prefix="chat_export"):
+    safe_chat_name = "".join(c if c.isalnum() else "_" for c in chat_name)
+    return f"{prefix}_{safe_chat_name}_{datetime.datetime.now():%Y%m%d_%H%M}.{extension}"
+
+def current_chat_exporter(fmt):
+    """
+    Returns a zero-argument callable for st.download_button that builds the export only when clicked.
+    Only the keys create_save_data reads are snapshotted, because the callable runs outside the script thread.
+    """
+    state = { key: st.session_state.get(key) for key in history.SAVE_DATA_KEYS }
+    state["messages"] = list(state["messages"] or [])
+    encoder = CHAT_ENCODERS[fmt]
+    return lambda: _collect(encoder(history.create_save_data(state)))
+
+# --- Bulk Export ---
+def iter_saved_chats(name_filter=""):
+    """Yields (file stem, chat data) for saved chats whose name contains name_filter (case-insensitive)."""
+    name_filter = (name_filter or "").strip().lower()
+    for chat_id, chat_data in history.iter_saved_chat_data():
+        if name_filter and name_filter not in str(chat_data.get("chat_name", "")).lower(): continue
+        yield history.get_chat_filepath(chat_id).stem, chat_data
+
+def iter_bulk_jsonl(chats):
+    return (json.dumps(chat_data) + "\n" for _, chat_data in chats)
+
+def write_bulk_zip(out, chats, fmt):
+    """Encodes every chat into its own archive member, so only one parsed chat is held at a time."""
+    extension = "md" if fmt == "ZIP (Markdown)" else "json"
+    encoder = iter_chat_markdown if extension == "md" else iter_chat_json
+    count = 0
+    with zipfile.ZipFile(out, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for stem, chat_data in chats:
+            archive.writestr(f"{stem}.{extension}", _collect(encoder(chat_data)))
+            count += 1
+    return count
+
+def bulk_exporter(fmt, name_filter=""):
+    """Returns a zero-argument callable for st.download_button that archives all matching saved chats."""
+    def build():
+        chats = iter_saved_chats(name_filter)
+        if fmt == "JSONL": return _collect(iter_bulk_jsonl(chats))
+        out = io.BytesIO(); write_bulk_zip(out, chats, fmt)
+        return out.getvalue()
+    return build
@@ -0,0 +1,73 @@
+# core/fake_gemini.py
+# Offline stand-in for google.generativeai.GenerativeModel, used by the benchmarks and load tests.
+# Enable it in the app with GEMINI_FAKE_BACKEND=1 (see config.py).
+import random
+import time
+import types
+# Import config from top level
+import config
+
+class FakeChunk:
+    """Mimics the parts of a streamed GenerateContentResponse chunk that core.logic reads."""
+    def __init__(self, text, finish_reason=None, token_count=0):
+        self.text = text
+        self.parts = [types.SimpleNamespace(text=text)] if text else []
+        reason = types.SimpleNamespace(name=finish_reason) if finish_reason else None
+        self.candidates = [types.SimpleNamespace(finish_reason=reason)]
+        self.prompt_feedback = None
+        self.usage_metadata = types.SimpleNamespace(candidates_token_count=token_count)
+
+class FakeGenerativeModel:
+    """
+    Scripted GenerativeModel. Replies are either the given `chunks` or an echo of the prompt split
+    into `chunk_count` pieces, delivered after `first_chunk_latency` and then every `chunk_latency`
+    seconds. `error` is raised before the first chunk, or after `error_after` chunks if that is set.
+    With probability `spike_probability` a request waits an extra `spike_latency` before its first
+    chunk, and with probability `error_rate` it fails with a retryable ServiceUnavailable.
+    """
+    def __init__(self, model_name, system_instruction=None, chunks=None, chunk_count=None,
+                 first_chunk_latency=None, chunk_latency=None, error=None, error_after=None,
+                 spike_probability=None, spike_latency=None, error_rate=None, rng=None):
+        self.model_name = model_name
+        self.system_instruction = system_instruction
+        self.chunks = chunks
+        self.chunk_count = config.FAKE_CHUNK_COUNT if chunk_count is None else chunk_count
+        self.first_chunk_latency = config.FAKE_FIRST_CHUNK_LATENCY if first_chunk_latency is None else first_chunk_latency
+        self.chunk_latency = config.FAKE_CHUNK_LATENCY if chunk_latency is None else chunk_latency
+        self.error = error
+        self.error_after = error_after
+        self.spike_probability = config.FAKE_SPIKE_PROBABILITY if spike_probability is None else spike_probability
+        self.spike_latency = config.FAKE_SPIKE_LATENCY if spike_latency is None else spike_latency
+        self.error_rate = config.FAKE_ERROR_RATE if error_rate is None else error_rate
+        self.rng = rng or random.Random()
+        self.calls = 0
+        self.last_contents = None
+
+    def _reply_chunks(self, contents):
+        if self.chunks is not None: return list(self.chunks)
+        last_parts = contents[-1].get("parts", []) if contents else []
+        prompt = next((p for p in reversed(last_parts) if isinstance(p, str)), "")
+        words = f"Fake reply from {self.model_name} to: {prompt[:80]}".split(" ")
+        size = max(1, -(-len(words) // max(1, self.chunk_count)))
+        return [" ".join(words[i:i + size]) + " " for i in range(0, len(words), size)]
+
+    def _stream(self, reply_chunks, first_chunk_latency):
+        time.sleep(first_chunk_latency)
+        tokens = 0 # Reported cumulatively, like usage_metadata on real streamed chunks
+        for i, text in enumerate(reply_chunks):
+            if self.error is not None and self.error_after is not None and i >= self.error_after: raise self.error
+            if i: time.sleep(self.chunk_latency)
+            tokens += len(text.split())
+            yield FakeChunk(text, "STOP" if i == len(reply_chunks) - 1 else None, tokens)
+
+    def generate_content(self, contents, generation_config=None, safety_settings=None, stream=False):
+        self.calls += 1; self.last_contents = contents
+        if self.error is not None and self.error_after is None: raise self.error
+        if self.error_rate and self.rng.random() < self.error_rate:
+            from google.api_core.exceptions import ServiceUnavailable
+            raise ServiceUnavailable(f"Injected fake outage on {self.model_name}")
+        first_chunk_latency = self.first_chunk_latency
+        if self.spike_probability and self.rng.random() < self.spike_probability: first_chunk_latency += self.spike_latency
+        chunks = self._stream(self._reply_chunks(contents), first_chunk_latency)
+        if stream: return chunks
+        return FakeChunk("".join(chunk.text for chunk in chunks), "STOP")
@@ -1,10 +1,26 @@
 # core/gemini.py
 import streamlit as st
-import google.generativeai as genai
-from google.api_core.exceptions import ClientError, GoogleAPIError
+from concurrent.futures import ThreadPoolExecutor
 # Import config from top level
 import config
 
+# google.generativeai is slow to import, so it is only loaded on first use.
+_warmup_executor = None
+
+def _genai():
+    import google.generativeai as genai
+    return genai
+
+def create_model(model_name, system_prompt):
+    """Builds a GenerativeModel, or the offline fake when GEMINI_FAKE_BACKEND is set."""
+    if config.FAKE_BACKEND:
+        from . import fake_gemini
+        return fake_gemini.FakeGenerativeModel(model_name, system_instruction=system_prompt)
+    return _genai().GenerativeModel(model_name, system_instruction=system_prompt)
+
+def _configure_client(api_key):
+    if not config.FAKE_BACKEND: _genai().configure(api_key=api_key)
+
 def initialize_model():
     """Initializes the GenerativeModel object based on current session state settings."""
     if not st.session_state.get("genai_configured", False):
@@ -17,7 +33,7 @@ def initialize_model():
         st.session_state.system_prompt = current_system_prompt
 
     try:
-        st.session_state.gemini_model = genai.GenerativeModel( current_model_name, system_instruction=current_system_prompt )
+        st.session_state.gemini_model = create_model(current_model_name, current_system_prompt)
         print(f"Gemini model '{current_model_name}' initialized successfully.")
     except Exception as e:
         st.error(f"Error initializing model '{current_model_name}': {e}", icon="⚙️")
@@ -28,7 +44,7 @@ def configure_genai():
     api_key = st.session_state.get("google_api_key")
     if api_key:
         try:
-            with st.spinner("Configuring Google AI..."): genai.configure(api_key=api_key)
+            with st.spinner("Configuring Google AI..."): _configure_client(api_key)
             st.session_state.genai_configured = True
             initialize_model() # Call local function
             return True
@@ -37,4 +53,45 @@ def configure_genai():
             st.session_state.genai_configured = False; st.session_state.gemini_model = None; return False
     else:
         st.session_state.genai_configured = False; st.session_state.gemini_model = None
-        print("Google API Key not found in session state for configuration."); return False
\ No newline at end of file
+        print("Google API Key not found in session state for configuration."); return False
+
+# --- Background Warm-up ---
+def _configure_and_build(api_key, model_name, system_prompt):
+    """Runs off the script thread: must not touch st.* APIs."""
+    _configure_client(api_key)
+    return create_model(model_name, system_prompt or config.DEFAULT_SYSTEM_PROMPT)
+
+def start_background_warmup():
+    """Configures the client and builds the model in a worker thread so the first paint is not blocked."""
+    global _warmup_executor
+    api_key = st.session_state.get("google_api_key")
+    if not api_key: print("Google API Key not found in session state for configuration."); return False
+    if _warmup_executor is None: _warmup_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="gemini-warmup")
+    st.session_state.warmup_future = _warmup_executor.submit(_configure_and_build, api_key,
+        st.session_state.get("model_name", config.DEFAULT_MODEL_NAME), st.session_state.get("system_prompt"))
+    print("Started background API warm-up.")
+    return True
+
+def warmup_pending():
+    return st.session_state.get("warmup_future") is not None
+
+def collect_background_warmup(wait=False):
+    """
+    Applies a finished warm-up to session state. Returns True once nothing is pending.
+    A failure is kept in session state and shown by the next call that does not wait, because
+    main.py reruns straight after a blocking wait and that would wipe an error shown now.
+    """
+    future = st.session_state.get("warmup_future")
+    if future is not None and (wait or future.done()):
+        st.session_state.warmup_future = None
+        try:
+            st.session_state.gemini_model = future.result()
+            st.session_state.genai_configured = True
+            print(f"Gemini model '{st.session_state.model_name}' warmed up in background.")
+        except Exception as e:
+            print(f"Background API warm-up failed: {e}"); st.session_state.warmup_error = str(e)
+            st.session_state.genai_configured = False; st.session_state.gemini_model = None
+        future = None
+    if not wait and st.session_state.get("warmup_error"):
+        st.error(f"Failed to configure Google AI: {st.session_state.warmup_error}", icon="🚨"); st.session_state.warmup_error = None
+    return future is None
@@ -1,11 +1,13 @@
 # core/history.py
 import streamlit as st
 import json
+import pickle
 import datetime
 from pathlib import Path
 # Import from top level
 import config
 import state_manager
+from . import memory
 
 # Ensure history directory exists
 config.HISTORY_DIR.mkdir(parents=True, exist_ok=True)
@@ -26,29 +28,41 @@ def get_chat_filepath(chat_id):
     return config.HISTORY_DIR / f"chat_{chat_id}.json"
 
 # --- Data Structuring ---
-def create_save_data():
+# Session state keys read by create_save_data
+SAVE_DATA_KEYS = ("messages", "current_chat_id", "current_chat_name", "model_name", "system_prompt",
+    "temperature", "top_p", "max_tokens", "response_count")
+
+def create_save_data(state=None):
+    """Builds the saveable chat dict from session state, or from a snapshot of it when given."""
+    state = st.session_state if state is None else state
     messages_to_save = []
-    for msg in st.session_state.get("messages", []):
+    for msg in state.get("messages", []):
         raw_content = ""
         parts = msg.get("parts", [])
         if parts and isinstance(parts[0], str): raw_content = parts[0]
         messages_to_save.append({ "role": msg.get("role"), "content": raw_content })
-    return { "chat_id": st.session_state.current_chat_id, "chat_name": st.session_state.current_chat_name,
-        "model_name": st.session_state.model_name, "system_prompt": st.session_state.system_prompt,
-        "messages": messages_to_save, "temperature": st.session_state.temperature,
-        "top_p": st.session_state.top_p, "max_tokens": st.session_state.max_tokens,
-        "response_count": st.session_state.response_count, "saved_at": datetime.datetime.now().isoformat() }
+    return { "chat_id": state["current_chat_id"], "chat_name": state["current_chat_name"],
+        "model_name": state["model_name"], "system_prompt": state["system_prompt"],
+        "messages": messages_to_save, "temperature": state["temperature"],
+        "top_p": state["top_p"], "max_tokens": state["max_tokens"],
+        "response_count": state["response_count"], "saved_at": datetime.datetime.now().isoformat() }
 
 # --- Saving ---
 def save_current_chat_to_file():
     chat_id = st.session_state.get("current_chat_id")
     if not chat_id: print("Warning: Attempted to save chat without an ID."); return
+    from . import sessions # Deferred: sessions builds on this module
     filepath = get_chat_filepath(chat_id)
-    try:
-        data_to_save = create_save_data()
-        with open(filepath, "w", encoding="utf-8") as f: json.dump(data_to_save, f, indent=2)
-        set_last_chat_id(chat_id)
-    except Exception as e: st.error(f"Error auto-saving chat {chat_id}: {e}", icon="💾")
+    # Widget callbacks save before main.py rehydrates; never write out an evicted (emptied) chat
+    with sessions.pinned():
+        try:
+            data_to_save = create_save_data()
+            with open(filepath, "w", encoding="utf-8") as f: json.dump(data_to_save, f, indent=2)
+            set_last_chat_id(chat_id)
+        except Exception as e: st.error(f"Error auto-saving chat {chat_id}: {e}", icon="💾"); return
+    # Once an index exists, keep it in step even while this session has memory off, so edited or cleared
+    # chats never leave stale turns behind for cross-chat retrieval
+    if st.session_state.get("memory_enabled") or memory.index_exists(): memory.index_chat(chat_id, st.session_state.get("messages", []))
 
 def save_specific_chat_data(chat_id, chat_data):
     if not chat_id or not chat_data: return False
@@ -93,7 +107,7 @@ def _load_chat_data_into_state(data, source_description):
     st.session_state.response_count = temp_response_count
 
     st.session_state.pending_file_parts = []; st.session_state.last_uploaded_file_names = set()
-    st.session_state.renaming_chat_id = None
+    st.session_state.renaming_chat_id = None; st.session_state.compare_pending = None
     print(f"Chat '{st.session_state.current_chat_name}' loaded from {source_description}!")
     set_last_chat_id(st.session_state.current_chat_id)
     return True
@@ -128,15 +142,63 @@ def list_saved_chats():
     chat_files_meta.sort(key=lambda x: x["saved_at_dt"], reverse=True)
     return chat_files_meta
 
+def iter_saved_chat_data(exclude=()):
+    """Yields (chat_id, chat_data) for every saved chat in file name order, loading one file at a time."""
+    for filepath in sorted(config.HISTORY_DIR.glob("chat_*.json")):
+        file_chat_id = filepath.stem.replace("chat_", "")
+        if file_chat_id in exclude: continue
+        chat_data = load_chat_data(file_chat_id)
+        if chat_data: yield file_chat_id, chat_data
+
+def iter_saved_chat_messages(exclude=()):
+    """Yields (chat_id, messages) for every saved chat not in exclude, in the session message format, one file at a time."""
+    for file_chat_id, chat_data in iter_saved_chat_data(exclude):
+        messages = [{ "role": m.get("role"), "parts": [m.get("content", "")] } for m in chat_data.get("messages", [])]
+        yield chat_data.get("chat_id", file_chat_id), messages
+
 # --- Deleting ---
 def delete_chat_file(chat_id):
     filepath = get_chat_filepath(chat_id)
     try:
         if filepath.exists():
             filepath.unlink(); st.toast(f"Deleted chat ID {chat_id[:8]}...", icon="🗑️")
+            memory.remove_chat(chat_id)
             if get_last_chat_id() == chat_id:
                 if config.LAST_CHAT_ID_FILE.exists(): config.LAST_CHAT_ID_FILE.unlink()
             if st.session_state.get("renaming_chat_id") == chat_id: st.session_state.renaming_chat_id = None
             return True
         else: st.warning(f"Chat file ID {chat_id[:8]}... not found.", icon="⚠️"); return False
-    except Exception as e: st.error(f"Error deleting {filepath.name}: {e}", icon="❌"); return False
\ No newline at end of file
+    except Exception as e: st.error(f"Error deleting {filepath.name}: {e}", icon="❌"); return False
+
+# --- Idle Session Spill (see core/sessions.py) ---
+def get_session_spill_filepath(session_id):
+    return config.HISTORY_DIR / ".sessions" / f"session_{session_id}.pkl"
+
+def spill_session_state(session_id, payload):
+    """Writes the heavy parts of an idle session (messages incl. file bytes, pending files) to disk."""
+    filepath = get_session_spill_filepath(session_id)
+    filepath.parent.mkdir(parents=True, exist_ok=True)
+    with open(filepath, "wb") as f: pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+    return filepath.stat().st_size
+
+def restore_session_state(session_id):
+    """Reads back and removes a spilled session payload; returns None if there is nothing to restore."""
+    filepath = get_session_spill_filepath(session_id)
+    if not filepath.exists(): return None
+    try:
+        with open(filepath, "rb") as f: payload = pickle.load(f)
+    except Exception as e: print(f"Warning: Could not restore spilled session {session_id[:8]}...: {e}"); return None
+    discard_spilled_session(session_id)
+    return payload
+
+def discard_spilled_session(session_id):
+    try: get_session_spill_filepath(session_id).unlink(missing_ok=True)
+    except OSError as e: print(f"Warning: Could not remove spilled session {session_id[:8]}...: {e}")
+
+def discard_all_spilled_sessions():
+    """Removes spill files left by an earlier server process; their sessions (and file bytes) are gone."""
+    removed = 0
+    for filepath in (config.HISTORY_DIR / ".sessions").glob("session_*.pkl"):
+        try: filepath.unlink(); removed += 1
+        except OSError as e: print(f"Warning: Could not remove stale {filepath.name}: {e}")
+    return removed
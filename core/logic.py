@@ -1,14 +1,12 @@
 # core/logic.py
 import streamlit as st
 import traceback
-import google.generativeai as genai
-from google.api_core.exceptions import ClientError, GoogleAPIError
 
 # Import top-level and sibling/utils modules
 import state_manager # Top level
 import config        # Top level
-from . import history, gemini # Sibling modules in core
-from utils import files   # utils package
+from . import history, gemini, memory, compare, resilience # Sibling modules in core
+from utils import files, profiler # utils package
 
 # Helper function for formatting display messages
 def format_display_message(role, raw_content, response_number=None):
@@ -26,39 +24,21 @@ def handle_chat_prompt(prompt: str):
     if not prompt or not prompt.strip():
         st.warning("Please enter a message.")
         return
+    # Deferred: importing the Google client is the bulk of cold-start time.
+    import google.generativeai as genai
+    from google.api_core.exceptions import ClientError, GoogleAPIError
 
     # Step 1: Prepare User Message Parts for API
-    api_parts = []
-    files_sent_names = []
-    if st.session_state.pending_file_parts:
-        pending_files_copy = list(st.session_state.pending_file_parts)
-        api_parts.extend(pending_files_copy)
-        files_sent_names.extend([part.get("original_filename", f"File {i+1}") for i, part in enumerate(pending_files_copy)])
-        st.session_state.pending_file_parts = []; st.session_state.last_uploaded_file_names = set()
-    api_parts.append(prompt)
+    api_parts, user_display_text = _take_user_message_parts(prompt)
 
     # Step 2: Add User Message to Session State
-    user_display_text = prompt
-    if files_sent_names:
-         user_display_text += "\n\n*📁 (Sent with: " + ", ".join(files_sent_names) + ")*"
+    st.session_state.compare_pending = None # A new turn supersedes any unpicked comparison
     st.session_state.messages.append({
         "role": "user", "parts": api_parts, "display_content": user_display_text })
     history.save_current_chat_to_file()
 
     # Step 3: Prepare API History
-    api_history = []
-    for msg in st.session_state.messages[:-1]:
-        parts_for_history = msg.get("parts")
-        if parts_for_history is None: parts_for_history = [msg.get("display_content", "")]
-        elif not isinstance(parts_for_history, list): parts_for_history = [parts_for_history]
-        processed_parts = []
-        for part in parts_for_history:
-             if isinstance(part, str): processed_parts.append(part)
-             elif isinstance(part, dict) and "mime_type" in part and "data" in part: processed_parts.append(part)
-             else:
-                 try: processed_parts.append(str(part)); print(f"Warning: Converted unexpected part type to string in history: {type(part)}")
-                 except Exception: print(f"Warning: Skipping unserializable part type in history: {type(part)}")
-        api_history.append({"role": msg["role"], "parts": processed_parts})
+    api_history, request_parts = _prepare_request(prompt, api_parts, st.session_state.messages[:-1])
 
     # Step 4: Call Gemini API with Streaming
     try:
@@ -67,18 +47,18 @@ def handle_chat_prompt(prompt: str):
             response_placeholder.markdown("Thinking... 💭")
             full_response_container = [""]
             final_response_obj_container = [None]
+            resilience_stream = _build_resilient_stream(genai, api_history + [{"role": "user", "parts": request_parts}])
 
             def stream_generator():
                 try:
-                    generation_config = genai.types.GenerationConfig(
-                        temperature=st.session_state.temperature,
-                        top_p=st.session_state.top_p,
-                        max_output_tokens=st.session_state.max_tokens)
+                    generation_config = _generation_config(genai)
                     safety_settings = {}
-                    contents_for_api = api_history + [{"role": "user", "parts": api_parts}]
-                    stream = st.session_state.gemini_model.generate_content(
-                        contents=contents_for_api, generation_config=generation_config,
-                        safety_settings=safety_settings, stream=True)
+                    contents_for_api = api_history + [{"role": "user", "parts": request_parts}]
+                    if resilience_stream is not None: stream = resilience_stream
+                    else:
+                        stream = st.session_state.gemini_model.generate_content(
+                            contents=contents_for_api, generation_config=generation_config,
+                            safety_settings=safety_settings, stream=True)
                     for chunk in stream:
                         final_response_obj_container[0] = chunk
                         if chunk.parts:
@@ -92,10 +72,11 @@ def handle_chat_prompt(prompt: str):
                     yield error_message
                     print("Error details during stream generation:"); traceback.print_exc()
 
-            response_placeholder.write_stream(stream_generator)
+            with profiler.section("stream_response"): response_placeholder.write_stream(stream_generator)
             final_raw_response = full_response_container[0]
             final_response_object = final_response_obj_container[0]
             finish_reason_str, warning_suffix = _determine_finish_reason(final_response_object, final_raw_response)
+            if resilience_stream is not None: warning_suffix += resilience.describe(resilience_stream, st.session_state.model_name)
 
             if not final_raw_response.strip().startswith("*(Error"): st.session_state.response_count += 1
             final_display_text_with_warning = final_raw_response + warning_suffix
@@ -112,7 +93,124 @@ def handle_chat_prompt(prompt: str):
     # Step 6: Rerun
     st.rerun()
 
+def handle_compare_prompt(prompt: str):
+    """
+    Compare mode: sends the prompt to every selected model concurrently, streams each reply into
+    its own column, and keeps the results pending until the user picks one to commit to history.
+    """
+    if not prompt or not prompt.strip():
+        st.warning("Please enter a message.")
+        return
+    import google.generativeai as genai # Deferred, as in handle_chat_prompt
+
+    models = []
+    for model_name in dict.fromkeys(st.session_state.compare_models):
+        try: models.append((model_name, gemini.create_model(model_name, st.session_state.system_prompt or config.DEFAULT_SYSTEM_PROMPT)))
+        except Exception as e: st.error(f"Error initializing model '{model_name}': {e}", icon="⚙️")
+    if not models: return
+
+    api_parts, user_display_text = _take_user_message_parts(prompt)
+    api_history, request_parts = _prepare_request(prompt, api_parts, st.session_state.messages)
+    contents_for_api = api_history + [{"role": "user", "parts": request_parts}]
+
+    with st.chat_message("user", avatar="👤"): st.markdown(user_display_text)
+    placeholders = []
+    for column, (model_name, _) in zip(st.columns(len(models)), models):
+        with column:
+            st.markdown(f"**{model_name}**")
+            body, stats = st.empty(), st.empty(); body.markdown("Thinking... 💭")
+            placeholders.append((body, stats))
+
+    def on_update(index, run):
+        body, stats = placeholders[index]
+        body.markdown(run.text + ("" if run.done else " ▌") + (f"\n\n*(Error during generation: {run.error})*" if run.error else ""))
+        if run.done: stats.caption(format_compare_stats(run.stats()))
+
+    with profiler.section("compare_fan_out"):
+        runs = compare.fan_out(models, contents_for_api, _generation_config(genai), on_update, timeout=config.COMPARE_TIMEOUT_SECONDS)
+    st.session_state.compare_pending = { "prompt": prompt, "api_parts": api_parts, "user_display_text": user_display_text,
+        "results": [{ "text": run.text, "stats": run.stats(), "warning_suffix": _determine_finish_reason(run.last_chunk, run.text)[1] } for run in runs] }
+    st.rerun()
+
+def commit_compare_choice(index):
+    """Commits the prompt and the chosen comparison answer to the chat history."""
+    pending = st.session_state.get("compare_pending")
+    if not pending: return
+    chosen = pending["results"][index]
+    st.session_state.messages.append({ "role": "user", "parts": pending["api_parts"], "display_content": pending["user_display_text"] })
+    st.session_state.response_count += 1
+    display_text = chosen["text"] + chosen["warning_suffix"] + f"\n\n*— {chosen['stats']['model_name']}*"
+    st.session_state.messages.append({ "role": "model", "parts": [chosen["text"]],
+        "display_content": format_display_message("model", display_text, st.session_state.response_count) })
+    st.session_state.compare_pending = None
+    history.save_current_chat_to_file()
+
+def format_compare_stats(stats):
+    if stats["error"] and not stats["output_tokens"]: return f"⚠️ {stats['error']}"
+    first = f"{stats['first_chunk_s']:.2f}s" if stats["first_chunk_s"] is not None else "–"
+    approx = "~" if stats["tokens_estimated"] else ""
+    return f"⏱️ first chunk {first} · total {stats['total_s']:.2f}s · {approx}{stats['output_tokens']} tokens ({stats['tokens_per_s'] or 0} tok/s)"
+
 # --- Helper functions ---
+def _build_resilient_stream(genai, contents):
+    """A HedgedStream over the current model and the failover list, or None when the policy is off."""
+    if not st.session_state.get("resilience_enabled"): return None
+    primary_name = st.session_state.model_name; primary_model = st.session_state.gemini_model
+    system_prompt = st.session_state.system_prompt or config.DEFAULT_SYSTEM_PROMPT
+    # Called from worker threads, so everything it needs is captured here rather than read from st.session_state
+    def make_model(model_name): return primary_model if model_name == primary_name else gemini.create_model(model_name, system_prompt)
+    return resilience.HedgedStream([primary_name] + list(st.session_state.failover_models), make_model, contents,
+        _generation_config(genai), hedge_deadline=st.session_state.hedge_deadline, hedge=st.session_state.hedge_enabled)
+
+def _generation_config(genai):
+    return genai.types.GenerationConfig(temperature=st.session_state.temperature,
+        top_p=st.session_state.top_p, max_output_tokens=st.session_state.max_tokens)
+
+def _take_user_message_parts(prompt):
+    """Consumes pending file parts; returns (api_parts, display_text) for the new user message."""
+    api_parts = []
+    files_sent_names = []
+    if st.session_state.pending_file_parts:
+        pending_files_copy = list(st.session_state.pending_file_parts)
+        api_parts.extend(pending_files_copy)
+        files_sent_names.extend([part.get("original_filename", f"File {i+1}") for i, part in enumerate(pending_files_copy)])
+        st.session_state.pending_file_parts = []; st.session_state.last_uploaded_file_names = set()
+    api_parts.append(prompt)
+    user_display_text = prompt
+    if files_sent_names:
+         user_display_text += "\n\n*📁 (Sent with: " + ", ".join(files_sent_names) + ")*"
+    return api_parts, user_display_text
+
+def _prepare_request(prompt, api_parts, history_messages):
+    """Returns (api_history, request_parts), applying long-term memory retrieval when enabled."""
+    request_parts = api_parts
+    if st.session_state.get("memory_enabled"):
+        # Send only the recent tail plus the most relevant earlier turns instead of the whole history
+        with profiler.section("memory_retrieval"):
+            tail_start, memory_context = memory.retrieve_context(prompt, history_messages, st.session_state.current_chat_id,
+                st.session_state.memory_all_chats, st.session_state.memory_top_k, st.session_state.memory_recent_turns)
+        history_messages = history_messages[tail_start:]
+        if memory_context: request_parts = [memory_context] + api_parts
+    with profiler.section("prepare_history"): api_history = build_api_history(history_messages)
+    return api_history, request_parts
+
+def build_api_history(messages):
+    """Converts session messages into the contents list expected by generate_content."""
+    api_history = []
+    for msg in messages:
+        parts_for_history = msg.get("parts")
+        if parts_for_history is None: parts_for_history = [msg.get("display_content", "")]
+        elif not isinstance(parts_for_history, list): parts_for_history = [parts_for_history]
+        processed_parts = []
+        for part in parts_for_history:
+             if isinstance(part, str): processed_parts.append(part)
+             elif isinstance(part, dict) and "mime_type" in part and "data" in part: processed_parts.append(part)
+             else:
+                 try: processed_parts.append(str(part)); print(f"Warning: Converted unexpected part type to string in history: {type(part)}")
+                 except Exception: print(f"Warning: Skipping unserializable part type in history: {type(part)}")
+        api_history.append({"role": msg["role"], "parts": processed_parts})
+    return api_history
+
 def _determine_finish_reason(final_response_object, final_raw_response):
     finish_reason_str = "UNKNOWN"; warning_suffix = ""
     if final_response_object:
@@ -0,0 +1,307 @@
+# core/memory.py
+# Long-term memory: a NumPy vector index over past chat turns, kept next to the saved chats in
+# chat_history/.memory_index and updated incrementally whenever a chat is saved.
+import hashlib
+import json
+import re
+import threading
+import zlib
+# Import config from top level
+import config
+
+def _np():
+    # NumPy costs tens of ms to import and memory is off by default, so it is only loaded on first use
+    import numpy
+    return numpy
+
+# --- Embedders ---
+class HashingEmbedder:
+    """
+    Offline embedder: hashes word unigrams and bigrams into a fixed-size signed vector.
+    Uses crc32 rather than hash() so vectors are stable across processes and restarts.
+    """
+    def __init__(self, dim=config.MEMORY_HASHING_DIM):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def _features(self, text):
+        words = re.findall(r"\w+", text.lower())
+        return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+    def embed(self, texts, query=False):
+        """Hashing is symmetric, so queries and documents are embedded the same way."""
+        np = _np()
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            hashes = np.fromiter((zlib.crc32(f.encode("utf-8")) for f in self._features(text or "")), dtype=np.uint32)
+            if not hashes.size: continue
+            signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+            np.add.at(vectors[row], hashes % self.dim, signs)
+        return _normalize(vectors)
+
+class GeminiEmbedder:
+    """Embeds with the Gemini embedding API, batched. Needs a configured client and network access."""
+    BATCH_SIZE = 100
+
+    def __init__(self, model=config.MEMORY_GEMINI_EMBEDDING_MODEL):
+        self.model = model
+        self.name = f"gemini:{model}"
+        self.dim = None # Known after the first call
+
+    def embed(self, texts, query=False):
+        """query=True embeds search queries (retrieval_query) rather than stored turns (retrieval_document)."""
+        import google.generativeai as genai # Deferred like the rest of the client
+        np = _np()
+        task_type = "retrieval_query" if query else "retrieval_document"
+        batches = []
+        for start in range(0, len(texts), self.BATCH_SIZE):
+            batch = [t or " " for t in texts[start:start + self.BATCH_SIZE]]
+            result = genai.embed_content(model=self.model, content=batch, task_type=task_type)
+            batches.append(np.asarray(result["embedding"], dtype=np.float32))
+        vectors = np.concatenate(batches) if batches else np.zeros((0, self.dim or 0), dtype=np.float32)
+        self.dim = vectors.shape[1] if vectors.size else self.dim
+        return _normalize(vectors)
+
+EMBEDDERS = { "hashing": HashingEmbedder, "gemini": GeminiEmbedder }
+
+def _normalize(vectors):
+    np = _np()
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+def message_text(msg):
+    """The text of a session message, ignoring inline file parts."""
+    parts = msg.get("parts") or []
+    if not isinstance(parts, list): parts = [parts]
+    return "\n".join(p for p in parts if isinstance(p, str))
+
+def _text_fields(text):
+    """
+    Metadata kept per turn: an excerpt (what retrieval sends back) and a digest of the full text
+    (what sync_chat compares), so the index never holds a second copy of the whole chat corpus.
+    """
+    excerpt = text if len(text) <= config.MEMORY_EXCERPT_CHARS else text[:config.MEMORY_EXCERPT_CHARS] + "…"
+    return { "text": excerpt, "digest": hashlib.blake2b(text.encode("utf-8"), digest_size=8).hexdigest() }
+
+# --- Vector Index ---
+class VectorIndex:
+    """
+    Append-only float32 matrix of turn embeddings plus a parallel metadata list.
+    On disk: vectors.f32 (raw rows), meta.jsonl (one line per row) and index.json (embedder info).
+    Appends only write the new rows; removing or rewriting a chat compacts the files.
+    """
+    VERSION = 2 # 2: meta rows hold an excerpt and digest instead of the full turn text
+    def __init__(self, directory, embedder):
+        np = _np()
+        self.directory = directory
+        self.embedder = embedder
+        self.dim = embedder.dim
+        self._vectors = np.zeros((0, self.dim or 0), dtype=np.float32)
+        self._count = 0
+        self._chat_codes = np.zeros(0, dtype=np.int32)
+        self._turns = np.zeros(0, dtype=np.int32)
+        self._meta = []
+        self._codes = {} # chat_id -> int code used for vectorised masking
+        self._chat_rows = {} # chat_id -> number of turns indexed
+        self._lock = threading.RLock()
+        self._load()
+
+    def __len__(self): return self._count
+
+    # --- Persistence ---
+    @property
+    def _vectors_path(self): return self.directory / "vectors.f32"
+    @property
+    def _meta_path(self): return self.directory / "meta.jsonl"
+    @property
+    def _header_path(self): return self.directory / "index.json"
+
+    def _load(self):
+        np = _np()
+        if not self._header_path.exists(): return
+        try:
+            header = json.loads(self._header_path.read_text(encoding="utf-8"))
+            if header.get("embedder") != self.embedder.name:
+                print(f"Memory index was built with '{header.get('embedder')}', starting empty for '{self.embedder.name}'."); self.clear(); return
+            self.dim = header["dim"]
+            vectors = np.fromfile(self._vectors_path, dtype=np.float32) if self._vectors_path.exists() else np.zeros(0, dtype=np.float32)
+            with open(self._meta_path, "r", encoding="utf-8") as f: meta = [json.loads(line) for line in f if line.strip()]
+        except Exception as e: print(f"Warning: Could not load memory index, starting empty: {e}"); self.clear(); return
+        outdated = header.get("version", 1) < self.VERSION
+        if outdated: meta = [{ **m, **_text_fields(m.get("text", "")) } for m in meta] # Full text -> excerpt + digest
+        rows = min(len(meta), vectors.size // self.dim) # Tolerate a torn final append
+        self._vectors = np.zeros((0, self.dim), dtype=np.float32); self._count = 0; self._meta = []
+        self._append_rows(vectors[:rows * self.dim].reshape(rows, self.dim), meta[:rows])
+        if outdated or rows != len(meta) or rows * self.dim != vectors.size: self._rewrite()
+
+    def _write_header(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._header_path.write_text(json.dumps({ "embedder": self.embedder.name, "dim": self.dim, "version": self.VERSION }), encoding="utf-8")
+
+    def _rewrite(self):
+        self._write_header()
+        self._vectors[:self._count].tofile(self._vectors_path)
+        with open(self._meta_path, "w", encoding="utf-8") as f:
+            for m in self._meta: f.write(json.dumps(m) + "\n")
+
+    # --- In-memory updates ---
+    def _append_rows(self, vectors, metas):
+        np = _np()
+        if self.dim is None: self.dim = vectors.shape[1]
+        needed = self._count + len(metas)
+        if needed > len(self._vectors): # Grow geometrically so appends stay amortised O(1)
+            capacity = max(needed, 2 * len(self._vectors), 1024)
+            grown = np.zeros((capacity, self.dim), dtype=np.float32); grown[:self._count] = self._vectors[:self._count]
+            self._vectors = grown
+            self._chat_codes = np.resize(self._chat_codes, capacity); self._turns = np.resize(self._turns, capacity)
+        self._vectors[self._count:needed] = vectors
+        for offset, m in enumerate(metas):
+            code = self._codes.setdefault(m["chat_id"], len(self._codes))
+            self._chat_codes[self._count + offset] = code; self._turns[self._count + offset] = m["turn"]
+            self._chat_rows[m["chat_id"]] = max(self._chat_rows.get(m["chat_id"], 0), m["turn"] + 1)
+        self._meta.extend(metas); self._count = needed
+
+    def add_turns(self, chat_id, start_turn, turns):
+        """Embeds and appends (role, text) turns for chat_id, numbered from start_turn."""
+        np = _np()
+        if not turns: return
+        with self._lock:
+            vectors = self.embedder.embed([text for _, text in turns])
+            metas = [{ "chat_id": chat_id, "turn": start_turn + i, "role": role, **_text_fields(text) } for i, (role, text) in enumerate(turns)]
+            is_new = not self._header_path.exists()
+            self._append_rows(vectors, metas)
+            if is_new: self._write_header()
+            with open(self._vectors_path, "ab") as f: vectors.astype(np.float32).tofile(f)
+            with open(self._meta_path, "a", encoding="utf-8") as f:
+                for m in metas: f.write(json.dumps(m) + "\n")
+
+    def remove_chat(self, chat_id):
+        np = _np()
+        with self._lock:
+            if chat_id not in self._chat_rows: return
+            code = self._codes[chat_id]
+            keep = np.flatnonzero(self._chat_codes[:self._count] != code)
+            vectors = self._vectors[keep]; metas = [self._meta[i] for i in keep]
+            self._vectors = np.zeros((0, self.dim), dtype=np.float32); self._count = 0; self._meta = []
+            self._chat_rows.pop(chat_id, None)
+            self._append_rows(vectors, metas)
+            self._rewrite()
+
+    def sync_chat(self, chat_id, messages):
+        """Indexes turns added since the last sync; re-indexes the chat if earlier turns changed."""
+        np = _np()
+        with self._lock:
+            indexed = self._chat_rows.get(chat_id, 0)
+            if indexed:
+                last_row = np.flatnonzero((self._chat_codes[:self._count] == self._codes[chat_id]) & (self._turns[:self._count] == indexed - 1))
+                unchanged = (indexed <= len(messages) and last_row.size
+                    and self._meta[last_row[-1]]["digest"] == _text_fields(message_text(messages[indexed - 1]))["digest"])
+                if not unchanged: self.remove_chat(chat_id); indexed = 0
+            new_turns = [(msg.get("role", "user"), message_text(msg)) for msg in messages[indexed:]]
+            self.add_turns(chat_id, indexed, new_turns)
+
+    def chat_ids(self):
+        with self._lock: return set(self._chat_rows)
+
+    def clear(self):
+        np = _np()
+        with self._lock:
+            self._vectors = np.zeros((0, self.dim or 0), dtype=np.float32); self._count = 0; self._meta = []
+            self._codes = {}; self._chat_rows = {}
+            for path in (self._vectors_path, self._meta_path, self._header_path):
+                if path.exists(): path.unlink()
+
+    # --- Search ---
+    def search(self, queries, k, chat_id=None, exclude_tail=None, min_score=0.0):
+        """
+        Batched top-k cosine search. `queries` is a (q, dim) array of normalised vectors.
+        chat_id restricts results to one chat; exclude_tail=(chat_id, turn) drops that chat's
+        turns from `turn` onwards (the part of the conversation that is sent anyway).
+        Returns, per query, a list of (score, meta) sorted best first.
+        """
+        np = _np()
+        with self._lock:
+            n = self._count
+            if not n or not len(queries): return [[] for _ in range(len(queries))]
+            scores = queries @ self._vectors[:n].T
+            mask = np.zeros(n, dtype=bool)
+            if chat_id is not None: mask |= self._chat_codes[:n] != self._codes.get(chat_id, -1)
+            if exclude_tail is not None:
+                tail_chat, tail_turn = exclude_tail
+                mask |= (self._chat_codes[:n] == self._codes.get(tail_chat, -1)) & (self._turns[:n] >= tail_turn)
+            if mask.any(): scores[:, mask] = -np.inf
+            k = min(k, n)
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            results = []
+            for q in range(len(queries)):
+                ordered = top[q][np.argsort(-scores[q, top[q]])]
+                results.append([(float(scores[q, i]), self._meta[i]) for i in ordered if scores[q, i] > min_score])
+            return results
+
+# --- Module Helpers ---
+_index = None
+_index_lock = threading.Lock()
+
+def index_directory():
+    return config.HISTORY_DIR / ".memory_index"
+
+def get_index():
+    """Loads the shared index on first use; all sessions of this server process share it."""
+    global _index
+    with _index_lock:
+        directory = index_directory()
+        if _index is None or _index.directory != directory:
+            _index = VectorIndex(directory, EMBEDDERS[config.MEMORY_EMBEDDER]())
+        return _index
+
+def index_exists():
+    """Whether any session of this process has used memory, or an index was left on disk by an earlier run."""
+    return _index is not None or index_directory().exists()
+
+def index_chat(chat_id, messages):
+    try: get_index().sync_chat(chat_id, messages)
+    except Exception as e: print(f"Warning: Could not update memory index for chat {chat_id}: {e}")
+
+def remove_chat(chat_id):
+    if not index_exists(): return # Memory never used
+    try: get_index().remove_chat(chat_id)
+    except Exception as e: print(f"Warning: Could not remove chat {chat_id} from memory index: {e}")
+
+def rebuild_index(chats):
+    """Re-indexes every (chat_id, messages) pair from scratch, e.g. after switching embedders."""
+    index = get_index(); index.clear()
+    for chat_id, messages in chats: index.sync_chat(chat_id, messages)
+    return len(index)
+
+def indexed_chat_ids():
+    return get_index().chat_ids()
+
+def backfill_index(chats):
+    """Indexes (chat_id, messages) pairs that are not in the index yet; returns the number of turns added."""
+    index = get_index(); before = len(index); known = index.chat_ids()
+    for chat_id, messages in chats:
+        if chat_id not in known: index.sync_chat(chat_id, messages)
+    return len(index) - before
+
+def tail_start(messages, recent_turns):
+    """Index of the first message of the recent tail, moved forward so the tail starts on a user turn."""
+    start = max(0, len(messages) - recent_turns)
+    while start < len(messages) and messages[start].get("role") != "user": start += 1
+    return start
+
+def retrieve_context(prompt, messages, chat_id, all_chats, top_k, recent_turns):
+    """
+    Picks the recent tail of `messages` plus the top_k most relevant earlier turns.
+    Returns (tail_start_index, context_text or None); context_text is meant to be sent
+    as an extra leading part of the new user message.
+    """
+    start = tail_start(messages, recent_turns)
+    index = get_index()
+    query = index.embedder.embed([prompt], query=True)
+    hits = index.search(query, top_k, chat_id=None if all_chats else chat_id, exclude_tail=(chat_id, start), min_score=config.MEMORY_MIN_SCORE)[0]
+    if not hits: return start, None
+    lines = ["Relevant excerpts from earlier in this conversation or from past conversations (for context only):"]
+    for _, m in sorted(hits, key=lambda h: (h[1]["chat_id"] != chat_id, h[1]["chat_id"], h[1]["turn"])):
+        source = "this chat" if m["chat_id"] == chat_id else "a past chat"
+        lines.append(f"[{m['role']}, {source}]: {m['text']}")
+    return start, "\n\n".join(lines)
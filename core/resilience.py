@@ -0,0 +1,132 @@
+# core/resilience.py
+# Tail-latency protection for the request path: hedged requests and model failover.
+# Attempts run in worker threads that never touch Streamlit; chunks are handed over through a queue.
+import queue
+import threading
+import time
+
+def is_retryable(exc):
+    """True for transient server-side or transport errors worth retrying on another attempt."""
+    from google.api_core import exceptions as api_exceptions # Deferred with the rest of the client
+    retryable = (api_exceptions.ServiceUnavailable, api_exceptions.DeadlineExceeded, api_exceptions.TooManyRequests,
+        api_exceptions.ResourceExhausted, api_exceptions.InternalServerError, api_exceptions.GatewayTimeout,
+        TimeoutError, ConnectionError)
+    return isinstance(exc, retryable)
+
+class _Attempt:
+    def __init__(self, attempt_id, model_name, hedge):
+        self.attempt_id = attempt_id
+        self.model_name = model_name
+        self.hedge = hedge
+        self.cancelled = threading.Event()
+        self.started_at = time.perf_counter()
+
+def _attempt_worker(attempt, make_model, contents, generation_config, events):
+    stream = None
+    try:
+        model = make_model(attempt.model_name)
+        if attempt.cancelled.is_set(): return
+        stream = model.generate_content(contents=contents, generation_config=generation_config, safety_settings={}, stream=True)
+        for chunk in stream:
+            if attempt.cancelled.is_set(): return # The SDK cannot abort an open stream; stop reading it instead
+            events.put((attempt.attempt_id, "chunk", chunk))
+        events.put((attempt.attempt_id, "done", None))
+    except Exception as e: events.put((attempt.attempt_id, "error", e))
+    finally:
+        close = getattr(stream, "close", None)
+        if attempt.cancelled.is_set() and callable(close):
+            try: close()
+            except Exception: pass
+
+class HedgedStream:
+    """
+    Iterates the chunks of one logical request, served by whichever attempt starts streaming first.
+
+    The first attempt goes to model_names[0]. If no chunk arrives within hedge_deadline seconds of the
+    latest launch, a hedged attempt is launched on the next model in the list (or, once the list is used
+    up, the first model that has not failed, which may be the one still running; no hedge is sent if
+    every model has). The first attempt to produce a chunk wins and the others are cancelled.
+    Retryable errors before the first chunk fail over to the next model in the list. Once a reply has
+    started streaming, errors are raised to the caller because partial output cannot be replayed.
+    After iteration, served_by, hedged and errors describe what happened.
+    """
+    def __init__(self, model_names, make_model, contents, generation_config, hedge_deadline=None, hedge=True):
+        self.model_names = list(dict.fromkeys(model_names))
+        self.make_model = make_model
+        self.contents = contents
+        self.generation_config = generation_config
+        self.hedge_deadline = hedge_deadline
+        self.hedge = hedge and hedge_deadline is not None
+        self.served_by = None
+        self.hedged = False
+        self.errors = [] # (model_name, exception) for attempts that failed
+        self.first_chunk_s = None
+        self._events = queue.Queue()
+        self._attempts = {}
+        self._next_model = 0
+
+    def _launch(self, model_name, hedge=False):
+        attempt = _Attempt(len(self._attempts), model_name, hedge)
+        self._attempts[attempt.attempt_id] = attempt
+        threading.Thread(target=_attempt_worker, args=(attempt, self.make_model, self.contents, self.generation_config, self._events),
+            name=f"gemini-attempt-{attempt.attempt_id}", daemon=True).start()
+        print(f"Request attempt {attempt.attempt_id} {'(hedge) ' if hedge else ''}sent to '{model_name}'.")
+        return attempt
+
+    def _take_next_model(self):
+        if self._next_model >= len(self.model_names): return None
+        name = self.model_names[self._next_model]; self._next_model += 1
+        return name
+
+    def _cancel_all_except(self, winner_id=None):
+        for attempt in self._attempts.values():
+            if attempt.attempt_id != winner_id: attempt.cancelled.set()
+
+    def __iter__(self):
+        started = time.perf_counter()
+        self._launch(self._take_next_model())
+        active = set(self._attempts)
+        winner = None
+        hedge_pending = self.hedge; hedge_from = started # The deadline counts from the latest launch
+        try:
+            # Phase 1: race attempts until one produces its first chunk
+            while winner is None:
+                timeout = None
+                if hedge_pending: timeout = max(0.0, hedge_from + self.hedge_deadline - time.perf_counter())
+                try: attempt_id, kind, payload = self._events.get(timeout=timeout)
+                except queue.Empty:
+                    hedge_pending = False
+                    failed = {model_name for model_name, _ in self.errors}
+                    hedge_model = self._take_next_model() or next((m for m in self.model_names if m not in failed), None)
+                    if hedge_model is not None: active.add(self._launch(hedge_model, hedge=True).attempt_id); self.hedged = True
+                    continue
+                if attempt_id not in active: continue # Late event from a cancelled attempt
+                if kind == "error":
+                    active.discard(attempt_id); model_name = self._attempts[attempt_id].model_name
+                    self.errors.append((model_name, payload))
+                    print(f"Request attempt {attempt_id} on '{model_name}' failed: {payload}")
+                    if not is_retryable(payload): raise payload
+                    if not active:
+                        fallback = self._take_next_model()
+                        if fallback is None: raise payload
+                        active.add(self._launch(fallback).attempt_id); hedge_from = time.perf_counter()
+                    continue
+                winner = attempt_id
+                self._cancel_all_except(winner)
+                self.served_by = self._attempts[winner].model_name
+                self.first_chunk_s = time.perf_counter() - started
+                if kind == "done": return # Empty reply
+                yield payload
+            # Phase 2: stream the rest of the winning attempt
+            while True:
+                attempt_id, kind, payload = self._events.get()
+                if attempt_id != winner: continue
+                if kind == "done": return
+                if kind == "error": raise payload
+                yield payload
+        finally: self._cancel_all_except() # Also stops the winner if the caller abandoned the stream early
+
+def describe(stream, requested_model):
+    """A short note for the chat when the reply did not come straight from the requested model."""
+    if stream.served_by and stream.served_by != requested_model: return f"\n\n*(Answered by fallback model `{stream.served_by}`)*"
+    return ""
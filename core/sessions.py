@@ -0,0 +1,243 @@
+# core/sessions.py
+# Per-session memory accounting and idle-session eviction.
+# Every browser tab keeps its own session state in the server process. The heavy parts of idle
+# sessions (messages with inline file bytes, pending uploads, the model object) are spilled to disk
+# through core.history and restored on the session's next rerun.
+import contextlib
+import logging
+import sys
+import threading
+import time
+import uuid
+import streamlit
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+# Import from top level and sibling modules
+import config
+from . import history, gemini
+
+# Keys moved to disk on eviction (with their emptied values), and keys that are dropped and rebuilt on rehydration
+SPILLED_KEYS = { "messages": list, "pending_file_parts": list, "last_uploaded_file_names": set, "compare_pending": lambda: None }
+DROPPED_KEYS = { "gemini_model": lambda: None, "profiler_runs": list }
+
+# Streamlit releases whose private session manager lookup (used by _session_closed) has been checked
+SESSION_LOOKUP_VERSIONS = ((1, 18), (2, 0)) # [min, max)
+
+# _registry_lock only guards the _sessions dict; each record's own lock covers its eviction, rehydration
+# and disk I/O, so one session's spill or save never blocks another session.
+_registry_lock = threading.Lock()
+_sessions = {} # session key -> SessionRecord
+_sweeper = None
+_sweep_requested = threading.Event()
+SWEEPER_THREAD_NAME = "session-sweeper"
+
+class _SweeperWarningFilter(logging.Filter):
+    """SessionState writes warn about the missing ScriptRunContext; expected on the sweeper thread."""
+    def filter(self, record): return threading.current_thread().name != SWEEPER_THREAD_NAME
+
+logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").addFilter(_SweeperWarningFilter())
+
+class SessionRecord:
+    """
+    Bookkeeping for one session. `state` is the SafeSessionState of its latest rerun; every rerun gets a
+    new wrapper over the same SessionState. `lock` and `running` keep eviction away from code that reads
+    the spilled keys: main.py's rerun hooks and pinned() blocks.
+    """
+    def __init__(self, key, streamlit_session_id, state):
+        self.key = key
+        self.streamlit_session_id = streamlit_session_id
+        self.state = state
+        self.lock = threading.RLock()
+        self.last_active = time.monotonic()
+        self.running = False
+        self.evicted = False
+        self.size_bytes = 0
+        self.spilled_bytes = 0
+
+def estimate_size(obj, _seen=None):
+    """Approximate deep size in bytes of plain containers, strings and bytes; other objects count shallowly."""
+    if _seen is None: _seen = set()
+    if id(obj) in _seen: return 0
+    _seen.add(id(obj))
+    size = sys.getsizeof(obj, 0)
+    if isinstance(obj, dict): size += sum(estimate_size(k, _seen) + estimate_size(v, _seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)): size += sum(estimate_size(item, _seen) for item in obj)
+    return size
+
+def _state_size(state):
+    return sum(estimate_size(value) for value in state.filtered_state.values())
+
+def _get(state, key, default=None):
+    # SafeSessionState has no .get(); only the st.session_state proxy does
+    return state[key] if key in state else default
+
+def _current():
+    """(session key, SafeSessionState) of the running script, or (None, None) outside a server session."""
+    ctx = get_script_run_ctx(suppress_warning=True)
+    if ctx is None: return None, None
+    state = ctx.session_state
+    # Kept in the state itself: AppTest gives every simulated session the same ctx.session_id
+    if "session_key" not in state: state["session_key"] = str(uuid.uuid4())
+    return state["session_key"], state
+
+def _lookup(key):
+    with _registry_lock: return _sessions.get(key)
+
+# --- Streamlit Session Lookup ---
+def _streamlit_version():
+    try: return tuple(int(part) for part in streamlit.__version__.split(".")[:2])
+    except ValueError: return (0, 0)
+
+def _session_info_lookup():
+    """
+    Streamlit's private session-manager lookup, which tells a closed session from one that is only
+    disconnected (and may reconnect). Returns None outside a server or on an unchecked Streamlit version.
+    """
+    low, high = SESSION_LOOKUP_VERSIONS
+    if not low <= _streamlit_version() < high: return None
+    from streamlit.runtime import Runtime
+    if not Runtime.exists(): return None
+    session_mgr = getattr(Runtime.instance(), "_session_mgr", None)
+    return getattr(session_mgr, "get_session_info", None)
+
+def _session_closed(lookup, streamlit_session_id):
+    return lookup is not None and lookup(streamlit_session_id) is None
+
+# --- Rerun Hooks (called from main.py) ---
+def begin_rerun():
+    """Registers the current session, marks it busy so it cannot be evicted mid-run, and rehydrates it if needed."""
+    key, state = _current()
+    if key is None: return
+    with _registry_lock:
+        record = _sessions.get(key)
+        if record is None: record = _sessions[key] = SessionRecord(key, get_script_run_ctx().session_id, state)
+    with record.lock:
+        record.state = state; record.running = True; record.last_active = time.monotonic()
+        rehydrate()
+    _ensure_sweeper()
+
+def end_rerun():
+    """Re-measures the current session and marks it idle; wakes the sweeper early if over the memory budget."""
+    key, state = _current()
+    record = _lookup(key) if key is not None else None
+    if record is None: return
+    with record.lock:
+        try: record.size_bytes = _state_size(state)
+        except Exception as e: print(f"Warning: Could not measure session {key[:8]}...: {e}")
+        record.running = False; record.last_active = time.monotonic()
+    with _registry_lock: total = sum(r.size_bytes for r in _sessions.values())
+    if total > config.SESSION_MEMORY_BUDGET_MB * 2**20: _sweep_requested.set()
+
+@contextlib.contextmanager
+def pinned():
+    """
+    Rehydrates the current session and holds off its eviction for the enclosed block. For code that reads
+    the chat outside main.py's rerun hooks, such as widget callbacks, which run before the script body.
+    """
+    key, _ = _current()
+    record = _lookup(key) if key is not None else None
+    if record is None: yield; return # Never registered, so never evicted
+    with record.lock:
+        rehydrate()
+        yield
+
+# --- Eviction & Rehydration ---
+def _evict(record):
+    """
+    Spills the heavy keys of an idle session to disk and drops them from memory. Caller holds record.lock.
+    None of SPILLED_KEYS or DROPPED_KEYS are widget keys, so widget updates and callbacks of a rerun that
+    starts meanwhile never touch them except through pinned() or begin_rerun(), which wait for record.lock.
+    """
+    state = record.state
+    payload = { key: state[key] for key in SPILLED_KEYS if key in state }
+    try: record.spilled_bytes = history.spill_session_state(record.key, payload)
+    except Exception as e: print(f"Warning: Could not spill session {record.key[:8]}...: {e}"); return False
+    size_before = record.size_bytes
+    for key, empty in list(SPILLED_KEYS.items()) + list(DROPPED_KEYS.items()): state[key] = empty()
+    state["session_evicted"] = True
+    record.evicted = True
+    try: record.size_bytes = _state_size(state)
+    except Exception: pass
+    print(f"Evicted idle session {record.key[:8]}... (~{(size_before - record.size_bytes) / 2**20:.1f} MB freed).")
+    return True
+
+def rehydrate():
+    """Restores the current session's spilled state, falling back to its saved chat file. Safe to call repeatedly."""
+    key, state = _current()
+    record = _lookup(key) if key is not None else None
+    if record is None: return False
+    with record.lock:
+        if not _get(state, "session_evicted"): return False
+        payload = history.restore_session_state(key)
+        if payload is not None:
+            for name, value in payload.items(): state[name] = value
+        else:
+            print(f"Warning: No spilled state for session {key[:8]}...; reloading its saved chat.")
+            history.load_chat_from_id(state["current_chat_id"])
+        state["session_evicted"] = False
+        record.evicted = False; record.spilled_bytes = 0
+        if _get(state, "genai_configured") and _get(state, "gemini_model") is None: gemini.initialize_model()
+    print(f"Rehydrated session {key[:8]}... ({len(_get(state, 'messages', []))} messages).")
+    return True
+
+def sweep(now=None):
+    """
+    Forgets closed sessions, then evicts sessions idle longer than SESSION_IDLE_TIMEOUT_SECONDS and the
+    least recently used ones while the total exceeds SESSION_MEMORY_BUDGET_MB. Running sessions, and
+    sessions whose lock is held (being rehydrated or saved), are skipped until the next sweep. Returns the number of sessions evicted.
+    """
+    now = time.monotonic() if now is None else now
+    budget_bytes = config.SESSION_MEMORY_BUDGET_MB * 2**20
+    lookup = _session_info_lookup()
+    with _registry_lock:
+        closed = [key for key, r in _sessions.items() if not r.running and _session_closed(lookup, r.streamlit_session_id)]
+        for key in closed: del _sessions[key]
+        records = list(_sessions.values())
+    for key in closed: history.discard_spilled_session(key)
+    total = sum(r.size_bytes for r in records)
+    evicted = 0
+    for record in sorted(records, key=lambda r: r.last_active):
+        if not record.lock.acquire(blocking=False): continue # Being rehydrated or saved right now
+        try:
+            if record.running or record.evicted: continue
+            if now - record.last_active < config.SESSION_IDLE_TIMEOUT_SECONDS and total <= budget_bytes: continue
+            size_before = record.size_bytes
+            if _evict(record): evicted += 1; total -= size_before - record.size_bytes
+        finally: record.lock.release()
+    return evicted
+
+def _sweep_loop():
+    while True:
+        _sweep_requested.wait(config.SESSION_SWEEP_INTERVAL_SECONDS); _sweep_requested.clear()
+        try: sweep()
+        except Exception as e: print(f"Warning: Session sweep failed: {e}")
+
+def _ensure_sweeper():
+    """
+    Starts the background sweeper once per process so tabs left open are evicted without further reruns.
+    The first start also removes spill files from an earlier process, whose sessions no longer exist.
+    """
+    global _sweeper
+    with _registry_lock:
+        if _sweeper is not None and _sweeper.is_alive(): return
+        first_start = _sweeper is None
+        _sweeper = threading.Thread(target=_sweep_loop, name=SWEEPER_THREAD_NAME, daemon=True); _sweeper.start()
+    if first_start:
+        if _session_info_lookup() is None and _streamlit_version() >= (1, 18):
+            print(f"Streamlit {streamlit.__version__} is not a checked version; closed sessions will not be forgotten until restart.")
+        removed = history.discard_all_spilled_sessions()
+        if removed: print(f"Removed {removed} stale session spill file(s) from a previous run.")
+
+# --- Metrics ---
+def get_metrics(keys=None):
+    """
+    One row per tracked session with its estimated in-memory state size, idle time and eviction status.
+    Pass session keys to report only those sessions.
+    """
+    current_key, _ = _current()
+    now = time.monotonic()
+    with _registry_lock: records = [r for r in _sessions.values() if keys is None or r.key in keys]
+    records.sort(key=lambda r: r.size_bytes, reverse=True)
+    return [{ "session": record.key[:8] + ("  (this)" if record.key == current_key else ""),
+        "state_mb": round(record.size_bytes / 2**20, 3), "spilled_mb": round(record.spilled_bytes / 2**20, 3),
+        "idle_s": 0 if record.running else round(now - record.last_active), "evicted": record.evicted }
+        for record in records]
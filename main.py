@@ -1,4 +1,6 @@
 # main.py
+import time
+_script_started = time.perf_counter() # Taken before the imports so --profile-startup can see their cost
 import streamlit as st
 import traceback # Keep for potential top-level debugging if needed
 
@@ -7,37 +9,69 @@ import config
 import state_manager
 import startup
 from ui import sidebar, chat_display # Import UI package modules
-from core import logic, gemini     # Import Core package modules
+from core import logic, gemini, sessions # Import Core package modules
+from utils import profiler
+
+startup_profiler = startup.StartupProfiler(_script_started)
+startup_profiler.mark("imports")
 
 # --- Set Page Config FIRST ---
 # Must be the first Streamlit command
 st.set_page_config(page_title="Gemini Chat+", layout="wide")
 
+# --- Restore State if this Session Was Evicted While Idle ---
+sessions.begin_rerun()
+
 # --- Initialize Session State (Runs on every script execution) ---
 state_manager.initialize_session()
 
-# --- Run One-Time Startup Logic ---
-startup.run_startup_logic()
+# Everything below is timed per rerun when developer mode is on (see Configuration in the sidebar)
+try:
+    with profiler.profile_rerun():
+        # --- Run One-Time Startup Logic ---
+        with profiler.section("startup"):
+            startup.run_startup_logic()
+            gemini.collect_background_warmup()
+        startup_profiler.mark("startup_logic")
+
+        # --- Main App UI ---
+        st.title(f"✨ Gemini Chat: {st.session_state.current_chat_name}")
+        # Display caption based on initialized session state
+        st.caption(f"Model: `{st.session_state.model_name}` | Temp: `{st.session_state.temperature:.2f}` | TopP: `{st.session_state.top_p:.2f}` | Max Tokens: `{st.session_state.max_tokens}` | Chat ID: `{st.session_state.current_chat_id[:8]}...`")
 
-# --- Main App UI ---
-st.title(f"✨ Gemini Chat: {st.session_state.current_chat_name}")
-# Display caption based on initialized session state
-st.caption(f"Model: `{st.session_state.model_name}` | Temp: `{st.session_state.temperature:.2f}` | TopP: `{st.session_state.top_p:.2f}` | Max Tokens: `{st.session_state.max_tokens}` | Chat ID: `{st.session_state.current_chat_id[:8]}...`")
+        # --- Render Sidebar UI ---
+        with profiler.section("sidebar"):
+            sidebar.render_sidebar() # Call function from ui.sidebar
+        startup_profiler.mark("sidebar")
 
-# --- Render Sidebar UI ---
-sidebar.render_sidebar() # Call function from ui.sidebar
+        # --- Render Chat Message History ---
+        with profiler.section("messages"):
+            chat_display.display_chat_messages() # Call function from ui.chat_display
+            chat_display.display_pending_comparison()
+        startup_profiler.mark("messages")
 
-# --- Render Chat Message History ---
-chat_display.display_chat_messages() # Call function from ui.chat_display
+        # --- Handle Chat Input ---
+        # Check if the model is ready before enabling input
+        model_ready = st.session_state.get("gemini_model") is not None
+        prompt = st.chat_input("Ask Gemini..." if not gemini.warmup_pending() else "Connecting to Gemini...", disabled=(not model_ready))
+        startup_profiler.mark("first_render")
 
-# --- Handle Chat Input ---
-# Check if the model is ready before enabling input
-model_ready = st.session_state.get("gemini_model") is not None
-prompt = st.chat_input("Ask Gemini...", disabled=(not model_ready))
+        if prompt:
+            with profiler.section("prompt"):
+                if st.session_state.compare_mode and len(st.session_state.compare_models) >= 2: logic.handle_compare_prompt(prompt)
+                else: logic.handle_chat_prompt(prompt) # Call function from core.logic
 
-if prompt:
-    logic.handle_chat_prompt(prompt) # Call function from core.logic
+        # --- Finish Background Warm-up ---
+        # The page is already on screen; block here and rerun so the input is enabled once the model is ready.
+        if gemini.warmup_pending():
+            with profiler.section("warmup_wait", idle=True):
+                gemini.collect_background_warmup(wait=True)
+            startup_profiler.mark("warmup_ready")
+            startup_profiler.report()
+            st.rerun()
+        startup_profiler.report()
+finally: sessions.end_rerun() # Also runs when st.rerun() interrupts the script
 
 # --- Optional: Add footer ---
 # st.divider()
-# st.caption("Modular Gemini Chatbot v3")
\ No newline at end of file
+# st.caption("Modular Gemini Chatbot v3")
@@ -1,5 +1,9 @@
 # startup.py
 import streamlit as st
+import sys
+import json
+import time
+import datetime
 # Import necessary modules from top-level and core package
 import state_manager
 import config
@@ -38,12 +42,40 @@ def run_startup_logic():
 
         if not st.session_state.get("initial_key_check_done", False):
             if st.session_state.google_api_key and not st.session_state.genai_configured:
-                print("Performing initial API key check...")
-                gemini.configure_genai() # This also initializes model
+                print("Performing initial API key check in background...")
+                gemini.start_background_warmup() # Collected by main.py once the UI has rendered
             elif not st.session_state.google_api_key:
                 print("API Key not found for initial check.")
             st.session_state.initial_key_check_done = True
 
     if st.session_state.get("loaded_on_start", False):
         st.success(f"Chat '{st.session_state.current_chat_name}' auto-loaded!", icon="📂")
-        st.session_state.loaded_on_start = False
\ No newline at end of file
+        st.session_state.loaded_on_start = False
+
+# --- Startup Profiling ---
+PROFILE_STARTUP_FLAG = "--profile-startup"
+
+class StartupProfiler:
+    """Records wall-clock marks for the first run of a session when started with `-- --profile-startup`."""
+    def __init__(self, started_at):
+        self.started_at = started_at
+        self.enabled = PROFILE_STARTUP_FLAG in sys.argv and st.session_state.get("app_just_started", True)
+        self.marks = []
+
+    def mark(self, label):
+        if self.enabled: self.marks.append((label, time.perf_counter() - self.started_at))
+
+    def report(self):
+        if not self.enabled or not self.marks: return
+        self.enabled = False
+        print("--- Startup profile (seconds since script start) ---")
+        previous = 0.0
+        for label, elapsed in self.marks:
+            print(f"{label:<24} {elapsed:8.3f}  (+{elapsed - previous:.3f})"); previous = elapsed
+        record = { "recorded_at": datetime.datetime.now().isoformat(), "python": sys.version.split()[0],
+            "modules_loaded": len(sys.modules), "marks": {label: round(elapsed, 4) for label, elapsed in self.marks} }
+        try:
+            config.STARTUP_PROFILE_FILE.parent.mkdir(parents=True, exist_ok=True)
+            with open(config.STARTUP_PROFILE_FILE, "a", encoding="utf-8") as f: f.write(json.dumps(record) + "\n")
+            print(f"Startup profile appended to {config.STARTUP_PROFILE_FILE}")
+        except OSError as e: print(f"Warning: Could not write startup profile: {e}")
@@ -25,6 +25,7 @@ def initialize_session():
     st.session_state.setdefault("pending_file_parts", [])
     st.session_state.setdefault("last_uploaded_file_names", set())
     st.session_state.setdefault("initial_key_check_done", False)
+    st.session_state.setdefault("warmup_error", None) # Set by a failed background warm-up, shown on the next run
     st.session_state.setdefault("autoload_last_chat", True)
     st.session_state.setdefault("app_just_started", True)
     st.session_state.setdefault("loaded_on_start", False)
@@ -32,6 +33,22 @@ def initialize_session():
     st.session_state.setdefault("temperature", config.DEFAULT_TEMPERATURE)
     st.session_state.setdefault("top_p", config.DEFAULT_TOP_P)
     st.session_state.setdefault("max_tokens", config.DEFAULT_MAX_TOKENS)
+    st.session_state.setdefault("memory_enabled", False)
+    st.session_state.setdefault("memory_all_chats", False)
+    st.session_state.setdefault("memory_top_k", config.MEMORY_DEFAULT_TOP_K)
+    st.session_state.setdefault("memory_recent_turns", config.MEMORY_DEFAULT_RECENT_TURNS)
+    st.session_state.setdefault("resilience_enabled", False)
+    st.session_state.setdefault("hedge_enabled", True)
+    st.session_state.setdefault("hedge_deadline", config.DEFAULT_HEDGE_DEADLINE_SECONDS)
+    st.session_state.setdefault("failover_models", list(config.DEFAULT_FAILOVER_MODELS))
+    st.session_state.setdefault("compare_mode", False)
+    st.session_state.setdefault("compare_models", [])
+    st.session_state.setdefault("compare_pending", None)
+    st.session_state.setdefault("dev_mode", False)
+    st.session_state.setdefault("profiler_use_cprofile", True)
+    st.session_state.setdefault("profiler_history_size", config.PROFILER_HISTORY_SIZE)
+    st.session_state.setdefault("profiler_runs", [])
+    st.session_state.setdefault("session_evicted", False) # Set by core.sessions while the heavy state is on disk
 
 def reset_chat_session_state(new_chat_id=None):
     """Resets state variables specific to a single chat session."""
@@ -42,4 +59,5 @@ def reset_chat_session_state(new_chat_id=None):
     st.session_state.pending_file_parts = []
     st.session_state.last_uploaded_file_names = set()
     st.session_state.renaming_chat_id = None
+    st.session_state.compare_pending = None
     # Keep current model parameters or reset? Let's keep them for now.
\ No newline at end of file
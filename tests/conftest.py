@@ -0,0 +1,6 @@
+# tests/conftest.py
+# The app imports its modules from the repository root (config, core, ...), as main.py does.
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,62 @@
+# tests/test_compare.py
+import threading
+import time
+
+from core import compare
+from core.fake_gemini import FakeChunk, FakeGenerativeModel
+
+CONTENTS = [{ "role": "user", "parts": ["Compare these"] }]
+
+def fake(name, **kwargs):
+    kwargs.setdefault("first_chunk_latency", 0.0); kwargs.setdefault("chunk_latency", 0.0)
+    kwargs.setdefault("spike_probability", 0.0); kwargs.setdefault("error_rate", 0.0)
+    return (name, FakeGenerativeModel(name, **kwargs))
+
+class CountingModel:
+    """Streams `chunks` one every `chunk_latency` seconds and counts how many were actually produced."""
+    def __init__(self, chunks, chunk_latency=0.0):
+        self.chunks = chunks; self.chunk_latency = chunk_latency; self.produced = 0
+
+    def generate_content(self, contents, generation_config=None, safety_settings=None, stream=False):
+        def chunks():
+            for chunk in self.chunks:
+                time.sleep(self.chunk_latency); self.produced += 1
+                yield chunk
+        return chunks()
+
+def test_wall_time_tracks_the_slowest_model():
+    models = [fake(name, first_chunk_latency=0.3) for name in ("a", "b", "c")]
+    start = time.perf_counter()
+    runs = compare.fan_out(models, CONTENTS, None)
+    wall = time.perf_counter() - start
+    assert all(run.done and run.error is None for run in runs)
+    assert 0.3 <= wall < 0.6 # Run one after another this would take at least 0.9 s
+
+def test_one_model_error_does_not_affect_the_others():
+    runs = compare.fan_out([fake("a"), fake("b", error=RuntimeError("boom")), fake("c")], CONTENTS, None)
+    assert runs[1].error == "boom" and runs[1].done
+    for run in (runs[0], runs[2]):
+        assert run.error is None and run.text.startswith(f"Fake reply from {run.model_name}")
+
+def test_timeout_marks_unfinished_runs_and_stops_their_workers():
+    slow = CountingModel([FakeChunk("word ")] * 50, chunk_latency=0.05)
+    runs = compare.fan_out([fake("fast"), ("slow", slow)], CONTENTS, None, timeout=0.3)
+    assert runs[0].error is None and runs[0].done
+    assert runs[1].error == "Timed out" and runs[1].done and runs[1].text
+    time.sleep(0.2) # Give the worker time to see the cancel event
+    produced = slow.produced
+    time.sleep(0.3)
+    assert slow.produced == produced < 50
+
+def test_usage_metadata_tokens_are_preferred_over_word_count():
+    counted = CountingModel([FakeChunk("two words ", token_count=3), FakeChunk("more ", "STOP", token_count=7)])
+    uncounted = CountingModel([FakeChunk("three little words")])
+    runs = compare.fan_out([("counted", counted), ("uncounted", uncounted)], CONTENTS, None)
+    stats = [run.stats() for run in runs]
+    assert stats[0]["output_tokens"] == 7 and not stats[0]["tokens_estimated"]
+    assert stats[1]["output_tokens"] == 3 and stats[1]["tokens_estimated"]
+
+def test_on_update_runs_on_the_calling_thread():
+    threads = set()
+    runs = compare.fan_out([fake("a"), fake("b")], CONTENTS, None, on_update=lambda i, run: threads.add(threading.current_thread()))
+    assert threads == {threading.current_thread()} and all(run.done for run in runs)
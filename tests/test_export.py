@@ -0,0 +1,61 @@
+# tests/test_export.py
+import io
+import json
+import zipfile
+
+import pytest
+
+import config
+from core import export, history
+
+def make_chat(chat_id, name, *contents, system_prompt="Be brief."):
+    return { "chat_id": chat_id, "chat_name": name, "model_name": "gemini-test", "system_prompt": system_prompt,
+        "messages": [{ "role": "user" if i % 2 == 0 else "model", "content": text } for i, text in enumerate(contents)],
+        "saved_at": "2026-01-02T03:04:05" }
+
+@pytest.fixture
+def saved_chats(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "HISTORY_DIR", tmp_path)
+    chats = [make_chat("a1", "Cooking ideas", "pasta?", "yes"), make_chat("b2", "Travel plans", "Rome", "nice"),
+        make_chat("c3", "More cooking", "soup?")]
+    for chat in chats: history.get_chat_filepath(chat["chat_id"]).write_text(json.dumps(chat), encoding="utf-8")
+    return chats
+
+# --- Single Chat ---
+def test_chat_json_round_trips():
+    chat = make_chat("a1", "Cooking ideas", "pasta?", "yes")
+    assert json.loads(export._collect(export.iter_chat_json(chat))) == chat
+
+def test_chat_markdown_layout():
+    chat = make_chat("a1", "Cooking ideas", "pasta?", "yes", "and sauce?", "tomato", system_prompt="Line one\nLine two")
+    text = export._collect(export.iter_chat_markdown(chat)).decode("utf-8")
+    assert text.startswith("# Cooking ideas\n\n*Model: `gemini-test` | Saved: 2026-01-02T03:04:05 | Chat ID: `a1`*\n\n")
+    assert "> **System Instructions:** Line one\n> Line two\n\n" in text
+    assert text.index("## 👤 User\n\npasta?") < text.index("## ✨ Model (R1)\n\nyes") < text.index("## ✨ Model (R2)\n\ntomato")
+
+def test_chat_markdown_without_system_prompt():
+    text = export._collect(export.iter_chat_markdown(make_chat("a1", "Chat", "hi", system_prompt=""))).decode("utf-8")
+    assert "System Instructions" not in text
+
+# --- Bulk Export ---
+def test_bulk_jsonl_has_one_chat_per_line(saved_chats):
+    lines = export.bulk_exporter("JSONL")().decode("utf-8").splitlines()
+    assert [json.loads(line) for line in lines] == saved_chats
+
+@pytest.mark.parametrize("fmt, extension", [("ZIP (JSON)", "json"), ("ZIP (Markdown)", "md")])
+def test_bulk_zip_member_names(saved_chats, fmt, extension):
+    with zipfile.ZipFile(io.BytesIO(export.bulk_exporter(fmt)())) as archive:
+        assert archive.namelist() == [f"chat_{chat['chat_id']}.{extension}" for chat in saved_chats]
+        if extension == "json": assert json.loads(archive.read("chat_b2.json")) == saved_chats[1]
+        else: assert archive.read("chat_b2.md").decode("utf-8").startswith("# Travel plans\n")
+
+def test_bulk_name_filter_is_case_insensitive(saved_chats):
+    lines = export.bulk_exporter("JSONL", "  COOKING ")().decode("utf-8").splitlines()
+    assert [json.loads(line)["chat_id"] for line in lines] == ["a1", "c3"]
+    with zipfile.ZipFile(io.BytesIO(export.bulk_exporter("ZIP (JSON)", "travel")())) as archive:
+        assert archive.namelist() == ["chat_b2.json"]
+
+def test_bulk_export_skips_unreadable_chats(saved_chats):
+    history.get_chat_filepath("broken").write_text("{not json", encoding="utf-8")
+    lines = export.bulk_exporter("JSONL")().decode("utf-8").splitlines()
+    assert [json.loads(line)["chat_id"] for line in lines] == ["a1", "b2", "c3"]
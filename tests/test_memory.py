@@ -0,0 +1,187 @@
+# tests/test_memory.py
+import json
+
+import numpy as np
+import pytest
+
+from core import memory
+
+def make_messages(*texts):
+    return [{ "role": "user" if i % 2 == 0 else "model", "parts": [text] } for i, text in enumerate(texts)]
+
+@pytest.fixture
+def index(tmp_path):
+    return memory.VectorIndex(tmp_path / "index", memory.HashingEmbedder())
+
+def rows_on_disk(index):
+    return (index.directory / "vectors.f32").stat().st_size // (4 * index.dim)
+
+def query(index, text):
+    return index.embedder.embed([text], query=True)
+
+# --- sync_chat ---
+def test_sync_chat_appends_only_new_turns(index):
+    messages = make_messages("my cat is called Whiskers", "nice name")
+    index.sync_chat("a", messages)
+    first_rows = list(index._meta)
+    messages += make_messages("what about dogs", "dogs are great")
+    index.sync_chat("a", messages)
+    assert len(index) == 4 and rows_on_disk(index) == 4
+    assert index._meta[:2] == first_rows # Earlier rows were not re-embedded or rewritten
+    assert [m["turn"] for m in index._meta] == [0, 1, 2, 3]
+
+def test_sync_chat_is_a_no_op_when_nothing_changed(index):
+    messages = make_messages("hello", "hi there")
+    index.sync_chat("a", messages); index.sync_chat("a", messages)
+    assert len(index) == 2 and rows_on_disk(index) == 2
+
+def test_sync_chat_reindexes_when_earlier_turns_changed(index):
+    index.sync_chat("a", make_messages("first question", "first answer", "second question"))
+    index.sync_chat("a", make_messages("edited question", "edited answer"))
+    assert len(index) == 2 and rows_on_disk(index) == 2
+    assert [m["text"] for m in index._meta] == ["edited question", "edited answer"]
+
+def test_sync_chat_ignores_file_parts(index):
+    messages = [{ "role": "user", "parts": [{ "mime_type": "image/png", "data": b"\x89PNG" }, "look at this"] }]
+    index.sync_chat("a", messages)
+    assert index._meta[0]["text"] == "look at this"
+
+def test_long_turns_store_only_an_excerpt(index, monkeypatch):
+    monkeypatch.setattr(memory.config, "MEMORY_EXCERPT_CHARS", 10)
+    index.sync_chat("a", make_messages("x" * 50))
+    assert index._meta[0]["text"] == "x" * 10 + "…"
+    on_disk = (index.directory / "meta.jsonl").read_text(encoding="utf-8")
+    assert "x" * 11 not in on_disk
+
+def test_sync_chat_detects_edits_beyond_the_excerpt(index, monkeypatch):
+    monkeypatch.setattr(memory.config, "MEMORY_EXCERPT_CHARS", 10)
+    index.sync_chat("a", make_messages("same start, first ending"))
+    index.sync_chat("a", make_messages("same start, other ending"))
+    assert len(index) == 1 and index._meta[0]["digest"] == memory._text_fields("same start, other ending")["digest"]
+
+def test_version_1_index_is_migrated_to_excerpts(index, monkeypatch):
+    index.sync_chat("a", make_messages("alpha " * 10, "beta"))
+    header = json.loads((index.directory / "index.json").read_text())
+    (index.directory / "index.json").write_text(json.dumps({ **header, "version": 1 }))
+    full_text_rows = [{ k: v for k, v in m.items() if k != "digest" } for m in index._meta]
+    full_text_rows[0]["text"] = "alpha " * 10
+    (index.directory / "meta.jsonl").write_text("".join(json.dumps(m) + "\n" for m in full_text_rows))
+    monkeypatch.setattr(memory.config, "MEMORY_EXCERPT_CHARS", 12)
+    reloaded = memory.VectorIndex(index.directory, memory.HashingEmbedder())
+    assert reloaded._meta[0]["text"] == "alpha alpha …" and reloaded._meta[0]["digest"] == memory._text_fields("alpha " * 10)["digest"]
+    assert json.loads((index.directory / "index.json").read_text())["version"] == memory.VectorIndex.VERSION
+    reloaded.sync_chat("a", make_messages("alpha " * 10, "beta")) # Digests match, so nothing is re-embedded
+    assert len(reloaded) == 2 and rows_on_disk(reloaded) == 2
+
+# --- remove_chat ---
+def test_remove_chat_compacts_files_and_reloads(tmp_path, index):
+    index.sync_chat("a", make_messages("apples are red", "yes they are"))
+    index.sync_chat("b", make_messages("bananas are yellow", "indeed", "and curved"))
+    index.remove_chat("a")
+    assert len(index) == 3 and rows_on_disk(index) == 3
+    assert {m["chat_id"] for m in index._meta} == {"b"}
+
+    reloaded = memory.VectorIndex(index.directory, memory.HashingEmbedder())
+    assert len(reloaded) == 3
+    assert reloaded._meta == index._meta
+    np.testing.assert_allclose(reloaded._vectors[:3], index._vectors[:3])
+    hits = reloaded.search(query(reloaded, "bananas yellow"), 1)[0]
+    assert hits[0][1]["chat_id"] == "b" and hits[0][1]["turn"] == 0
+
+def test_remove_chat_then_sync_starts_from_turn_zero(index):
+    index.sync_chat("a", make_messages("one", "two"))
+    index.remove_chat("a")
+    index.sync_chat("a", make_messages("three"))
+    assert [(m["chat_id"], m["turn"]) for m in index._meta] == [("a", 0)]
+
+def test_reload_tolerates_torn_append(index):
+    index.sync_chat("a", make_messages("alpha", "beta"))
+    with open(index.directory / "vectors.f32", "ab") as f: f.write(b"\x00\x01") # Partial row from a crash
+    reloaded = memory.VectorIndex(index.directory, memory.HashingEmbedder())
+    assert len(reloaded) == 2 and rows_on_disk(reloaded) == 2
+
+def test_embedder_change_starts_empty(index):
+    index.sync_chat("a", make_messages("alpha"))
+    reloaded = memory.VectorIndex(index.directory, memory.HashingEmbedder(dim=64))
+    assert len(reloaded) == 0
+
+# --- search masking ---
+@pytest.fixture
+def two_chats(index):
+    index.sync_chat("a", make_messages("the cat sat on the mat", "ok", "the cat chased a mouse", "fun"))
+    index.sync_chat("b", make_messages("the cat sleeps all day", "cats do that"))
+    return index
+
+def test_search_chat_id_restricts_to_one_chat(two_chats):
+    hits = two_chats.search(query(two_chats, "cat"), 10, chat_id="b")[0]
+    assert hits and {m["chat_id"] for _, m in hits} == {"b"}
+
+def test_search_exclude_tail_drops_recent_turns_of_that_chat_only(two_chats):
+    hits = two_chats.search(query(two_chats, "cat"), 10, exclude_tail=("a", 2))[0]
+    found = {(m["chat_id"], m["turn"]) for _, m in hits}
+    assert ("a", 0) in found and ("b", 0) in found
+    assert not any(chat == "a" and turn >= 2 for chat, turn in found)
+
+def test_search_chat_id_and_exclude_tail_combined(two_chats):
+    hits = two_chats.search(query(two_chats, "cat"), 10, chat_id="a", exclude_tail=("a", 2))[0]
+    assert [(m["chat_id"], m["turn"]) for _, m in hits] == [("a", 0)]
+
+def test_search_unknown_chat_id_returns_nothing(two_chats):
+    assert two_chats.search(query(two_chats, "cat"), 10, chat_id="missing") == [[]]
+
+def test_search_results_sorted_and_batched(two_chats):
+    results = two_chats.search(query(two_chats, "cat mouse").repeat(2, axis=0), 3)
+    assert len(results) == 2 and results[0] == results[1]
+    scores = [score for score, _ in results[0]]
+    assert scores == sorted(scores, reverse=True)
+    assert results[0][0][1]["text"] == "the cat chased a mouse"
+
+# --- Embedders ---
+def test_gemini_embedder_uses_query_task_type_for_queries(monkeypatch):
+    genai = pytest.importorskip("google.generativeai")
+    task_types = []
+    def fake_embed_content(model, content, task_type):
+        task_types.append(task_type); return { "embedding": [[1.0, 0.0]] * len(content) }
+    monkeypatch.setattr(genai, "embed_content", fake_embed_content)
+    embedder = memory.GeminiEmbedder()
+    embedder.embed(["stored turn"]); embedder.embed(["search text"], query=True)
+    assert task_types == ["retrieval_document", "retrieval_query"]
+
+# --- Module Helpers ---
+@pytest.fixture
+def history_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(memory.config, "HISTORY_DIR", tmp_path)
+    monkeypatch.setattr(memory.config, "LAST_CHAT_ID_FILE", tmp_path / ".last_chat_id")
+    monkeypatch.setattr(memory.config, "MEMORY_EMBEDDER", "hashing")
+    monkeypatch.setattr(memory, "_index", None)
+    return tmp_path
+
+def test_backfill_index_adds_only_unindexed_chats(history_dir):
+    memory.index_chat("a", make_messages("apples", "red"))
+    first_rows = list(memory.get_index()._meta)
+    added = memory.backfill_index([("a", make_messages("changed", "ignored")), ("b", make_messages("bananas"))])
+    assert added == 1 and memory.indexed_chat_ids() == {"a", "b"}
+    assert memory.get_index()._meta[:2] == first_rows
+
+def test_index_exists_once_used_or_left_on_disk(history_dir):
+    assert not memory.index_exists()
+    memory.index_chat("a", make_messages("apples"))
+    assert memory.index_exists()
+    memory._index = None # A new process finds the index on disk
+    assert memory.index_exists()
+
+def test_save_syncs_index_when_it_exists_even_with_memory_off(history_dir, monkeypatch):
+    from core import history
+    state = { "current_chat_id": "a", "current_chat_name": "Chat", "model_name": "m", "system_prompt": "",
+        "temperature": 1.0, "top_p": 1.0, "max_tokens": 10, "response_count": 1, "memory_enabled": False,
+        "messages": make_messages("first question", "first answer") }
+    class FakeSessionState(dict): __getattr__ = dict.__getitem__
+    state = FakeSessionState(state)
+    monkeypatch.setattr(history.st, "session_state", state)
+    history.save_current_chat_to_file()
+    assert not memory.index_exists() # Memory never used: saving does not create an index
+
+    memory.index_chat("a", state["messages"])
+    state["messages"] = make_messages("cleared and restarted")
+    history.save_current_chat_to_file()
+    assert [m["text"] for m in memory.get_index()._meta] == ["cleared and restarted"]
@@ -0,0 +1,103 @@
+# tests/test_resilience.py
+import pytest
+
+api_exceptions = pytest.importorskip("google.api_core.exceptions")
+
+from core import resilience
+from core.fake_gemini import FakeGenerativeModel
+
+CONTENTS = [{ "role": "user", "parts": ["How fast is this?"] }]
+
+def fake(name, **kwargs):
+    kwargs.setdefault("first_chunk_latency", 0.0); kwargs.setdefault("chunk_latency", 0.0)
+    kwargs.setdefault("spike_probability", 0.0); kwargs.setdefault("error_rate", 0.0)
+    return FakeGenerativeModel(name, **kwargs)
+
+def hedged(models, names=None, **kwargs):
+    kwargs.setdefault("hedge_deadline", 0.05)
+    return resilience.HedgedStream(names or list(models), models.__getitem__, CONTENTS, None, **kwargs)
+
+def read_text(stream):
+    return "".join(chunk.text for chunk in stream)
+
+def test_hedge_wins_when_primary_spikes():
+    models = { "a": fake("a", first_chunk_latency=2.0), "b": fake("b") }
+    stream = hedged(models)
+    assert read_text(stream).startswith("Fake reply from b")
+    assert stream.served_by == "b" and stream.hedged
+    assert stream.first_chunk_s < 1.0
+    assert stream._attempts[0].cancelled.is_set() # The slow primary was told to stop
+
+def test_no_hedge_when_primary_is_fast():
+    models = { "a": fake("a"), "b": fake("b") }
+    stream = hedged(models, hedge_deadline=1.0)
+    read_text(stream)
+    assert stream.served_by == "a" and not stream.hedged and models["b"].calls == 0
+
+def test_hedge_disabled_waits_for_primary():
+    models = { "a": fake("a", first_chunk_latency=0.2), "b": fake("b") }
+    stream = hedged(models, hedge=False)
+    read_text(stream)
+    assert stream.served_by == "a" and not stream.hedged and models["b"].calls == 0
+
+def test_failover_on_service_unavailable():
+    models = { "a": fake("a", error=api_exceptions.ServiceUnavailable("down")), "b": fake("b") }
+    stream = hedged(models, hedge=False)
+    assert read_text(stream).startswith("Fake reply from b")
+    assert stream.served_by == "b"
+    assert [name for name, _ in stream.errors] == ["a"]
+
+def test_non_retryable_error_raised_without_failover():
+    models = { "a": fake("a", error=api_exceptions.InvalidArgument("bad request")), "b": fake("b") }
+    with pytest.raises(api_exceptions.InvalidArgument): read_text(hedged(models, hedge=False))
+    assert models["b"].calls == 0
+
+def test_last_retryable_error_is_raised_when_all_models_fail():
+    models = { "a": fake("a", error=api_exceptions.ServiceUnavailable("a down")), "b": fake("b", error=api_exceptions.ServiceUnavailable("b down")) }
+    with pytest.raises(api_exceptions.ServiceUnavailable, match="b down"): read_text(hedged(models, hedge=False))
+
+def test_mid_stream_error_is_raised_not_failed_over():
+    models = { "a": fake("a", chunks=["one ", "two ", "three"], error=api_exceptions.ServiceUnavailable("dropped"), error_after=1), "b": fake("b") }
+    stream = hedged(models, hedge=False)
+    received = []
+    with pytest.raises(api_exceptions.ServiceUnavailable):
+        for chunk in stream: received.append(chunk.text)
+    assert received == ["one "] and stream.served_by == "a" and models["b"].calls == 0
+
+def test_losing_attempts_are_cancelled():
+    models = { "a": fake("a", first_chunk_latency=0.5), "c": fake("c", chunks=["one ", "two"]) }
+    stream = hedged(models, names=["a", "c"])
+    for _chunk in stream:
+        winner = next(a for a in stream._attempts.values() if a.model_name == stream.served_by)
+        losers = [a for a in stream._attempts.values() if a is not winner]
+        assert stream.served_by == "c" and not winner.cancelled.is_set()
+        assert losers and all(a.cancelled.is_set() for a in losers)
+        break
+
+def test_all_attempts_cancelled_when_caller_stops_early():
+    models = { "a": fake("a", chunks=["one ", "two ", "three"], chunk_latency=0.05) }
+    stream = hedged(models, hedge=False)
+    for _chunk in stream: break # Abandoning the loop closes the generator and runs its finally block
+    assert all(a.cancelled.is_set() for a in stream._attempts.values())
+
+def test_hedge_skips_models_that_already_failed():
+    models = { "a": fake("a", error=api_exceptions.ServiceUnavailable("down")), "b": fake("b", first_chunk_latency=0.3) }
+    stream = hedged(models)
+    read_text(stream)
+    assert stream.served_by == "b"
+    assert models["a"].calls == 1 # The hedge went to 'b' again, not back to the failed 'a'
+
+def test_hedge_deadline_restarts_after_failover():
+    # 'a' fails just before the deadline; the failover to 'b' gets a full deadline of its own
+    models = { "a": fake("a", first_chunk_latency=0.18, error=api_exceptions.ServiceUnavailable("down"), error_after=0),
+        "b": fake("b", first_chunk_latency=0.15), "c": fake("c") }
+    stream = hedged(models, ["a", "b", "c"], hedge_deadline=0.2)
+    read_text(stream)
+    assert stream.served_by == "b" and not stream.hedged
+    assert models["b"].calls == 1 and models["c"].calls == 0
+
+def test_single_model_hedges_to_itself():
+    models = { "a": fake("a", first_chunk_latency=0.3) }
+    stream = hedged(models)
+    read_text(stream)
+    assert stream.hedged and models["a"].calls == 2
@@ -0,0 +1,107 @@
+# tests/test_sessions.py
+import json
+import threading
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("st_copy_to_clipboard") # main.py renders chat replies with it
+from streamlit.testing.v1 import AppTest
+
+import config
+from core import history, sessions
+
+MAIN_SCRIPT = Path(__file__).resolve().parent.parent / "main.py"
+
+@pytest.fixture(autouse=True)
+def isolated(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "HISTORY_DIR", tmp_path)
+    monkeypatch.setattr(config, "LAST_CHAT_ID_FILE", tmp_path / ".last_chat_id")
+    monkeypatch.setattr(config, "DEFAULT_GOOGLE_API_KEY", "fake-test-key")
+    monkeypatch.setattr(config, "FAKE_BACKEND", True)
+    monkeypatch.setattr(config, "FAKE_FIRST_CHUNK_LATENCY", 0.0); monkeypatch.setattr(config, "FAKE_CHUNK_LATENCY", 0.0)
+    monkeypatch.setattr(config, "FAKE_SPIKE_PROBABILITY", 0.0); monkeypatch.setattr(config, "FAKE_ERROR_RATE", 0.0)
+    monkeypatch.setattr(config, "SESSION_IDLE_TIMEOUT_SECONDS", 1800); monkeypatch.setattr(config, "SESSION_MEMORY_BUDGET_MB", 512)
+    monkeypatch.setattr(sessions, "_sessions", {})
+    monkeypatch.setattr(sessions, "_ensure_sweeper", lambda: None) # Tests sweep explicitly
+
+def chatting_session(*prompts):
+    app = AppTest.from_file(str(MAIN_SCRIPT), default_timeout=60).run()
+    for prompt in prompts: app.chat_input[0].set_value(prompt).run()
+    assert not app.exception
+    return app
+
+def record_of(app):
+    return sessions._sessions[app.session_state["session_key"]]
+
+def saved_messages(app):
+    with open(history.get_chat_filepath(app.session_state["current_chat_id"]), encoding="utf-8") as f: return json.load(f)["messages"]
+
+def evict_idle(monkeypatch):
+    monkeypatch.setattr(config, "SESSION_IDLE_TIMEOUT_SECONDS", 0)
+    evicted = sessions.sweep()
+    monkeypatch.setattr(config, "SESSION_IDLE_TIMEOUT_SECONDS", 1800)
+    return evicted
+
+def test_idle_session_is_evicted_and_rehydrated(monkeypatch):
+    app = chatting_session("my cat is called Whiskers")
+    messages = list(app.session_state["messages"])
+    assert evict_idle(monkeypatch) == 1
+    assert app.session_state["messages"] == [] and app.session_state["session_evicted"]
+    assert app.session_state["gemini_model"] is None and record_of(app).evicted
+
+    app.run()
+    assert not app.exception and not app.session_state["session_evicted"]
+    assert app.session_state["messages"] == messages and app.session_state["gemini_model"] is not None
+
+def test_callback_save_after_eviction_keeps_the_chat(monkeypatch):
+    app = chatting_session("first question", "second question")
+    count = len(app.session_state["messages"])
+    evict_idle(monkeypatch)
+    app.slider(key="temperature").set_value(0.5).run() # on_change saves before main.py's begin_rerun
+    assert not app.exception
+    assert len(app.session_state["messages"]) == count
+    assert len(saved_messages(app)) == count # Not overwritten with the evicted (empty) chat
+
+def test_budget_evicts_least_recently_used_first(monkeypatch):
+    apps = [chatting_session(f"question from user {i}") for i in range(3)]
+    spilled = []
+    spill = history.spill_session_state
+    monkeypatch.setattr(history, "spill_session_state", lambda key, payload: spilled.append(key) or spill(key, payload))
+    records = [record_of(app) for app in apps]
+    total = sum(r.size_bytes for r in records)
+    monkeypatch.setattr(config, "SESSION_MEMORY_BUDGET_MB", (total - 1) / 2**20) # One eviction is enough
+    assert sessions.sweep() == 1 and spilled == [records[0].key]
+
+    apps[0].run() # Now the most recently used
+    monkeypatch.setattr(config, "SESSION_MEMORY_BUDGET_MB", 0)
+    spilled.clear()
+    assert sessions.sweep() == 3
+    assert spilled == [records[1].key, records[2].key, records[0].key]
+
+def test_sweep_skips_running_and_locked_sessions(monkeypatch):
+    running, locked, idle = (chatting_session("hello") for _ in range(3))
+    record_of(running).running = True
+    held, release = threading.Event(), threading.Event()
+    def hold(): # Like a pinned() save on another script thread
+        with record_of(locked).lock: held.set(); release.wait()
+    holder = threading.Thread(target=hold); holder.start(); held.wait()
+    try: assert evict_idle(monkeypatch) == 1
+    finally: release.set(); holder.join()
+    assert [record_of(app).evicted for app in (running, locked, idle)] == [False, False, True]
+
+def test_missing_spill_file_falls_back_to_saved_chat(monkeypatch):
+    app = chatting_session("remember this", "and this")
+    count = len(app.session_state["messages"])
+    evict_idle(monkeypatch)
+    history.discard_spilled_session(app.session_state["session_key"])
+    app.run()
+    assert not app.exception and not app.session_state["session_evicted"]
+    assert [m["parts"][0] for m in app.session_state["messages"]] == [m["content"] for m in saved_messages(app)]
+    assert len(app.session_state["messages"]) == count
+
+def test_discard_all_spilled_sessions_removes_stale_files():
+    directory = config.HISTORY_DIR / ".sessions"; directory.mkdir()
+    for name in ("session_old.pkl", "session_older.pkl", "keep.txt"): (directory / name).write_bytes(b"x")
+    assert history.discard_all_spilled_sessions() == 2
+    assert [p.name for p in directory.iterdir()] == ["keep.txt"]
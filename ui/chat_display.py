@@ -1,6 +1,5 @@
 # ui/chat_display.py
 import streamlit as st
-from st_copy_to_clipboard import st_copy_to_clipboard
 
 def display_chat_messages():
     """Displays the chat message history in the main app area."""
@@ -9,6 +8,7 @@ def display_chat_messages():
         if not st.session_state.get("messages"):
             st.info("Start chatting below, or load a chat from the history!", icon="👋")
             return
+        from st_copy_to_clipboard import st_copy_to_clipboard # Deferred until there is something to render
 
         for i, msg in enumerate(st.session_state.messages):
             role = msg.get("role", "user")
@@ -27,4 +27,25 @@ def display_chat_messages():
                     st_copy_to_clipboard(raw_content, key=copy_key) # Use basic call
             else: # User message
                 with st.chat_message(role, avatar=avatar):
-                    st.markdown(display_content, unsafe_allow_html=False)
\ No newline at end of file
+                    st.markdown(display_content, unsafe_allow_html=False)
+
+def display_pending_comparison():
+    """Shows the answers from the last compare-mode prompt side by side, each with a button to keep it."""
+    from core import logic
+    pending = st.session_state.get("compare_pending")
+    if not pending: return
+    with st.chat_message("user", avatar="👤"): st.markdown(pending["user_display_text"])
+    results = pending["results"]
+    st.caption("Pick the answer to keep in this chat:")
+    for i, (column, result) in enumerate(zip(st.columns(len(results)), results)):
+        with column:
+            stats = result["stats"]
+            st.markdown(f"**{stats['model_name']}**")
+            with st.container(border=True):
+                st.markdown(result["text"] + result["warning_suffix"] or "*(Empty response received)*")
+                if stats["error"]: st.caption(f"⚠️ {stats['error']}")
+            st.caption(logic.format_compare_stats(stats))
+            if st.button("✅ Use this answer", key=f"compare_choose_{i}", use_container_width=True, disabled=not result["text"].strip()):
+                logic.commit_compare_choice(i); st.rerun()
+    if st.button("🗑️ Discard comparison", key="compare_discard"):
+        st.session_state.compare_pending = None; st.rerun()
@@ -1,13 +1,12 @@
 # ui/sidebar.py
 import streamlit as st
-import json
 import datetime
 
 # Import from top-level and core/utils packages
 import config
 import state_manager
-from core import history, gemini
-from utils import files
+from core import history, gemini, export, memory, sessions
+from utils import files, profiler
 
 def render_sidebar():
     """Renders all elements within the Streamlit sidebar."""
@@ -17,7 +16,7 @@ def render_sidebar():
                 history.save_current_chat_to_file(); state_manager.reset_chat_session_state()
                 gemini.initialize_model(); history.save_current_chat_to_file()
                 st.success("Started new chat.", icon="✨"); st.rerun()
-            saved_chats = history.list_saved_chats()
+            with profiler.section("history_listing"): saved_chats = history.list_saved_chats()
             if not saved_chats: st.caption("No saved chats yet.")
             else:
                 st.caption("Click name to load, ✏️ to rename, 🗑️ to delete.")
@@ -25,15 +24,23 @@ def render_sidebar():
         st.divider()
         with st.expander("⚙️ Configuration", expanded=False):
             st.checkbox("Auto-load last chat on startup", key="autoload_last_chat", help="Load last chat automatically.")
+            st.checkbox("Developer mode (rerun profiler)", key="dev_mode", help="Profile every rerun and show the results in a sidebar panel.")
             _render_api_key_section()
             _render_model_selection()
+            _render_compare_settings()
+            _render_resilience_settings()
             _render_system_prompt()
+            _render_memory_settings()
         st.divider()
         with st.expander("📎 Attach Files", expanded=False): _render_file_uploader()
         st.divider()
-        with st.expander("🛠️ Chat Controls", expanded=False): _render_chat_controls()
+        with st.expander("🛠️ Chat Controls", expanded=False): _render_chat_controls(); _render_bulk_export()
         st.divider()
         with st.expander("🤖 Model Parameters", expanded=False): _render_model_parameters()
+        if st.session_state.dev_mode:
+            st.divider()
+            with st.expander("🧪 Rerun Profiler", expanded=True): _render_profiler_panel()
+            with st.expander("🧠 Session Memory", expanded=False): _render_session_memory()
 
 # --- Helper functions ---
 def _render_chat_history_item(chat_meta):
@@ -108,11 +115,48 @@ def _render_model_selection():
     if selected_model != st.session_state.model_name:
         st.session_state.model_name = selected_model; gemini.initialize_model(); history.save_current_chat_to_file(); st.rerun()
 
+def _render_compare_settings():
+    st.toggle("Compare mode", key="compare_mode", disabled=not st.session_state.genai_configured, help="Send each prompt to several models at once and pick the best answer.")
+    if not st.session_state.compare_mode: return
+    if not st.session_state.compare_models: st.session_state.compare_models = [st.session_state.model_name]
+    options = list(dict.fromkeys(config.AVAILABLE_MODELS + st.session_state.compare_models))
+    st.multiselect("Models to compare", options, key="compare_models", help="Each selected model answers in its own column.")
+    if len(st.session_state.compare_models) < 2: st.caption("Select at least two models; until then prompts go to the main model only.")
+
+def _render_resilience_settings():
+    st.toggle("Hedged requests & failover", key="resilience_enabled", disabled=not st.session_state.genai_configured, help="Retry slow or failing requests on other models instead of showing an error.")
+    if not st.session_state.resilience_enabled: return
+    st.toggle("Hedge slow requests", key="hedge_enabled", help="Send a second request if the first has not started streaming by the deadline; the first to respond wins.")
+    st.number_input("Hedge deadline (s)", 0.5, 60.0, step=0.5, key="hedge_deadline", disabled=not st.session_state.hedge_enabled)
+    st.multiselect("Failover models (in order)", config.AVAILABLE_MODELS, key="failover_models", help="Tried in order for hedges and after retryable errors.")
+
 def _render_system_prompt():
     st.subheader("System Instructions")
     def system_prompt_on_change(): gemini.initialize_model(); history.save_current_chat_to_file()
     st.text_area("System Instructions", key="system_prompt", height=100, label_visibility="collapsed", disabled=not st.session_state.genai_configured, help="Guide the model's behavior.", on_change=system_prompt_on_change)
 
+def _render_memory_settings():
+    st.subheader("Long-term Memory")
+    def backfill_saved_chats(): # Chats saved before the index existed are not in it yet
+        try: added = memory.backfill_index(history.iter_saved_chat_messages(exclude=memory.indexed_chat_ids()))
+        except Exception as e: st.error(f"Could not index saved chats: {e}", icon="🧠"); return
+        if added: st.toast(f"Indexed {added} turns from saved chats.", icon="🧠")
+    def memory_on_change():
+        if not st.session_state.memory_enabled: return
+        history.save_current_chat_to_file() # Indexes the current chat
+        if st.session_state.memory_all_chats: backfill_saved_chats()
+    def all_chats_on_change():
+        if st.session_state.memory_all_chats: backfill_saved_chats()
+    st.toggle("Retrieve relevant earlier turns", key="memory_enabled", on_change=memory_on_change, help="Send only recent messages plus the most relevant earlier turns instead of the full history.")
+    if not st.session_state.memory_enabled: return
+    st.toggle("Search all saved chats", key="memory_all_chats", on_change=all_chats_on_change, help="Off: only this chat's earlier turns are searched.")
+    st.slider("Relevant turns (top-k)", 1, 20, key="memory_top_k")
+    st.slider("Recent messages sent verbatim", 2, 50, step=2, key="memory_recent_turns")
+    if st.button("🔄 Rebuild Memory Index", key="rebuild_memory_index", use_container_width=True, help="Re-index every saved chat."):
+        with st.spinner("Indexing saved chats..."):
+            try: st.success(f"Indexed {memory.rebuild_index(history.iter_saved_chat_messages())} turns.", icon="🧠")
+            except Exception as e: st.error(f"Could not rebuild memory index: {e}", icon="🧠")
+
 def _render_file_uploader():
     uploaded_files = st.file_uploader("Upload Images/PDFs", type=["png", "jpg", "jpeg", "webp", "gif", "pdf"], accept_multiple_files=True, key="file_uploader", label_visibility="collapsed", disabled=not st.session_state.genai_configured)
     if uploaded_files:
@@ -134,11 +178,11 @@ def _render_chat_controls():
     st.subheader("Import / Export / Clear")
     col1, col2 = st.columns(2)
     with col1:
+        export_format = st.selectbox("Export format", list(export.CHAT_FORMATS), key="export_format", label_visibility="collapsed")
         try:
-            save_data_str = json.dumps(history.create_save_data(), indent=2)
-            safe_chat_name = "".join(c if c.isalnum() else "_" for c in st.session_state.current_chat_name)
-            dl_filename = f"chat_export_{safe_chat_name}_{datetime.datetime.now():%Y%m%d_%H%M}.json"
-            st.download_button("📥 Export", save_data_str, dl_filename, "application/json", use_container_width=True, disabled=not st.session_state.messages, help="Download current chat.")
+            extension, mime = export.CHAT_FORMATS[export_format]
+            dl_filename = export.export_filename(st.session_state.current_chat_name, extension)
+            st.download_button("📥 Export", export.current_chat_exporter(export_format), dl_filename, mime, use_container_width=True, disabled=not st.session_state.messages, help="Download current chat.")
         except Exception as e: st.error(f"Export error: {e}", icon="💾")
     with col2:
         uploaded_file_for_load = st.file_uploader("📤 Import", type="json", label_visibility="collapsed", key="load_chat_uploader", help="Load chat from JSON.")
@@ -150,8 +194,46 @@ def _render_chat_controls():
         st.session_state.last_uploaded_file_names = set(); st.session_state.response_count = 0
         history.save_current_chat_to_file(); st.success("Messages cleared.", icon="🧹"); st.rerun()
 
+def _render_bulk_export():
+    st.subheader("Export All Chats")
+    name_filter = st.text_input("Filter by name", key="bulk_export_filter", placeholder="Filter by name (optional)", label_visibility="collapsed")
+    bulk_format = st.selectbox("Archive format", list(export.BULK_FORMATS), key="bulk_export_format", label_visibility="collapsed")
+    extension, mime = export.BULK_FORMATS[bulk_format]
+    dl_filename = f"chat_history_export_{datetime.datetime.now():%Y%m%d_%H%M}.{extension}"
+    st.download_button("📦 Export All", export.bulk_exporter(bulk_format, name_filter), dl_filename, mime, use_container_width=True, help="Download all saved chats matching the filter as one archive.")
+
 def _render_model_parameters():
     is_model_ready = st.session_state.gemini_model is not None
     st.slider("Temperature", 0.0, 2.0, step=0.1, key="temperature", disabled=not is_model_ready, help="Controls randomness.", on_change=history.save_current_chat_to_file)
     st.slider("Top P", 0.0, 1.0, step=0.05, key="top_p", disabled=not is_model_ready, help="Nucleus sampling.", on_change=history.save_current_chat_to_file)
-    st.slider("Max Tokens", 50, config.DEFAULT_MAX_TOKENS, step=50, key="max_tokens", disabled=not is_model_ready, help="Max response length.", on_change=history.save_current_chat_to_file)
\ No newline at end of file
+    st.slider("Max Tokens", 50, config.DEFAULT_MAX_TOKENS, step=50, key="max_tokens", disabled=not is_model_ready, help="Max response length.", on_change=history.save_current_chat_to_file)
+
+def _render_profiler_panel():
+    col1, col2 = st.columns(2)
+    with col1: st.toggle("cProfile", key="profiler_use_cprofile", help="Collect function-level hot spots (higher overhead than wall-clock sections).")
+    with col2: st.number_input("Keep last", 1, 100, key="profiler_history_size", help="Number of reruns kept.")
+    runs = st.session_state.profiler_runs
+    if not runs: st.caption("No profiled reruns yet. Interact with the app to record some."); return
+    st.caption("Wall-clock ms per rerun (oldest → newest):")
+    st.bar_chart([round(run.total_ms or 0, 1) for run in runs], height=120)
+    labels = [f"{run.started_at:%H:%M:%S} – {run.total_ms or 0:.0f} ms" for run in runs]
+    selected_index = st.selectbox("Rerun", range(len(runs)), index=len(runs) - 1, format_func=lambda i: labels[i], key="profiler_selected_run")
+    run = runs[selected_index]
+    if run.note: st.caption(run.note)
+    st.dataframe(run.breakdown(), hide_index=True, use_container_width=True)
+    hot_spots = run.hot_spots()
+    if hot_spots: st.caption("Top hot spots (self time):"); st.dataframe(hot_spots, hide_index=True, use_container_width=True)
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("💾 Dump to disk", key="profiler_dump", use_container_width=True, help=f"Write .prof files and a summary under {config.PROFILE_DIR}/reruns."):
+            try: st.success(f"Saved to {profiler.dump_profiles(runs)}", icon="💾")
+            except OSError as e: st.error(f"Could not write profiles: {e}", icon="💾")
+    with col2:
+        if st.button("🧹 Clear", key="profiler_clear", use_container_width=True): st.session_state.profiler_runs = []; st.rerun()
+
+def _render_session_memory():
+    rows = sessions.get_metrics()
+    if not rows: st.caption("Session tracking needs a running Streamlit server."); return
+    total_mb = sum(row["state_mb"] for row in rows)
+    st.caption(f"{len(rows)} session(s) · {total_mb:.1f} MB of {config.SESSION_MEMORY_BUDGET_MB:.0f} MB budget · idle sessions are evicted to disk after {config.SESSION_IDLE_TIMEOUT_SECONDS / 60:.0f} min")
+    st.dataframe(rows, hide_index=True, use_container_width=True)
@@ -0,0 +1,112 @@
+# utils/profiler.py
+import streamlit as st
+import cProfile
+import contextlib
+import datetime
+import json
+import marshal
+import threading
+import time
+# Import config from top level
+import config
+
+# Only one cProfile profiler can be active per process on Python 3.12+, so sessions take turns.
+_cprofile_lock = threading.Lock()
+
+class RerunProfile:
+    """Wall-clock sections and (optionally) cProfile stats for a single script rerun."""
+    def __init__(self, use_cprofile):
+        self.started_at = datetime.datetime.now()
+        self.sections = [] # (name, depth, elapsed_ms) in completion order
+        self.total_ms = None
+        self.stats = None # pstats-format dict, as written by Profile.dump_stats
+        self.note = ""
+        self._depth = 0
+        self._start = time.perf_counter()
+        self._profile = None
+        self._profiling = False # True while this rerun holds _cprofile_lock with the profiler enabled
+        if use_cprofile:
+            if _cprofile_lock.acquire(blocking=False):
+                try: self._profile = cProfile.Profile(); self._profile.enable(); self._profiling = True
+                except ValueError as e: _cprofile_lock.release(); self._profile = None; self.note = f"cProfile unavailable: {e}"
+            else: self.note = "cProfile busy in another session; wall-clock only."
+
+    @contextlib.contextmanager
+    def section(self, name):
+        self._depth += 1; start = time.perf_counter()
+        try: yield
+        finally:
+            self._depth -= 1
+            self.sections.append((name, self._depth, (time.perf_counter() - start) * 1000))
+
+    @contextlib.contextmanager
+    def cprofile_released(self):
+        """Hands the process-wide profiler to other sessions while this rerun only waits, e.g. on the network."""
+        if self._profile is None or not self._profiling: yield; return
+        self._profile.disable(); self._profiling = False; _cprofile_lock.release()
+        try: yield
+        finally:
+            if _cprofile_lock.acquire(blocking=False):
+                try: self._profile.enable(); self._profiling = True
+                except ValueError as e: _cprofile_lock.release(); self.note = f"cProfile unavailable after wait: {e}"
+            else: self.note = "cProfile taken by another session mid-rerun; hot spots cover the part before it."
+
+    def finish(self):
+        self.total_ms = (time.perf_counter() - self._start) * 1000
+        if self._profile is not None:
+            if self._profiling: self._profile.disable(); _cprofile_lock.release(); self._profiling = False
+            self._profile.create_stats(); self.stats = self._profile.stats; self._profile = None
+
+    def hot_spots(self, top_n=config.PROFILER_TOP_N):
+        if not self.stats: return []
+        rows = []
+        for (filename, line, func), (cc, nc, tt, ct, _callers) in self.stats.items():
+            rows.append({ "function": f"{func} ({filename.rsplit('/', 1)[-1]}:{line})", "calls": nc,
+                "self_ms": round(tt * 1000, 2), "cumulative_ms": round(ct * 1000, 2) })
+        rows.sort(key=lambda r: r["self_ms"], reverse=True)
+        return rows[:top_n]
+
+    def breakdown(self):
+        return [{ "section": "  " * depth + name, "ms": round(ms, 2) } for name, depth, ms in reversed(self.sections)]
+
+# --- Session Helpers ---
+@contextlib.contextmanager
+def profile_rerun():
+    """Profiles the enclosed rerun when developer mode is on; records it even if st.rerun() interrupts."""
+    if not st.session_state.get("dev_mode", False):
+        st.session_state.active_rerun_profile = None; yield None; return
+    profile = RerunProfile(st.session_state.get("profiler_use_cprofile", True))
+    st.session_state.active_rerun_profile = profile
+    try: yield profile
+    finally:
+        profile.finish(); st.session_state.active_rerun_profile = None
+        runs = st.session_state.setdefault("profiler_runs", [])
+        runs.append(profile)
+        del runs[:-st.session_state.get("profiler_history_size", config.PROFILER_HISTORY_SIZE)]
+
+@contextlib.contextmanager
+def _idle_section(profile, name):
+    with profile.section(name), profile.cprofile_released(): yield
+
+def section(name, idle=False):
+    """
+    Times a named part of the current rerun; a no-op unless developer mode is on.
+    idle=True marks a part that only waits, so cProfile is released for other sessions meanwhile.
+    """
+    profile = st.session_state.get("active_rerun_profile")
+    if profile is None: return contextlib.nullcontext()
+    return _idle_section(profile, name) if idle else profile.section(name)
+
+def dump_profiles(runs):
+    """Writes each rerun's stats as a .prof file (readable with pstats/snakeviz) plus a JSON summary."""
+    out_dir = config.PROFILE_DIR / "reruns" / f"{datetime.datetime.now():%Y%m%d_%H%M%S}"
+    out_dir.mkdir(parents=True, exist_ok=True)
+    summary = []
+    for i, run in enumerate(runs):
+        stem = f"rerun_{i:02d}_{run.started_at:%H%M%S_%f}"
+        if run.stats:
+            with open(out_dir / f"{stem}.prof", "wb") as f: marshal.dump(run.stats, f)
+        summary.append({ "file": f"{stem}.prof" if run.stats else None, "started_at": run.started_at.isoformat(),
+            "total_ms": round(run.total_ms or 0, 2), "sections": run.breakdown(), "note": run.note })
+    with open(out_dir / "summary.json", "w", encoding="utf-8") as f: json.dump(summary, f, indent=2)
+    return out_dir